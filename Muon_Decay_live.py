@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Live view of a detector file that is still being written.
+
+Run with: bokeh serve --show Muon_Decay_live.py --args <file.data>
+
+Every second the newly appended lines are parsed, their decays are added to
+the histogram in place and the MLE and LS fits are refreshed. The cost of an
+update depends on the number of new lines and bins, not on the run length.
+"""
+import sys
+
+import numpy as np
+
+from bokeh.io import curdoc
+from bokeh.layouts import column, row
+from bokeh.models import ColumnDataSource, Div
+from bokeh.plotting import figure
+
+from muon_decay.data import NO_DECAY, read_appended
+from muon_decay.fit import bin_centres, fit_tau, model_curves
+
+path = sys.argv[1] if len(sys.argv) > 1 else "LevangieMcKeever_3000.data"
+bins = 400
+edges = np.linspace(0, 20, bins + 1)
+x = bin_centres(edges)
+#Below this many decays a fit says more about the noise than about tau
+MIN_FIT_EVENTS = 50
+UPDATE_MS = 1000
+HISTORY_POINTS = 10000
+
+state = dict(offset=0, lines=0, hist=np.zeros(bins, dtype=np.int64))
+
+hist_source = ColumnDataSource(data=dict(left=edges[:-1], right=edges[1:], x=x, top=np.zeros(bins),
+                                         err_low=np.zeros(bins), err_high=np.zeros(bins)))
+curve_source = ColumnDataSource(data=dict(x=x, mle=np.zeros(bins), ls=np.zeros(bins)))
+history_source = ColumnDataSource(data=dict(events=[], mle=[], mle_low=[], mle_high=[], ls=[]))
+
+plot = figure(title="Number of Muon Decays in relation to decay time", width=1500, height=800)
+plot.quad(top='top', bottom='top', left='left', right='right', source=hist_source)
+plot.segment(x0='x', y0='err_low', x1='x', y1='err_high', source=hist_source)
+plot.line('x', 'mle', source=curve_source, line_width=2, line_color='#ff0000', legend_label='MLE')
+plot.line('x', 'ls', source=curve_source, line_width=2, line_color='#ffa500', legend_label='LS')
+plot.xaxis.axis_label = "Time in microseconds"
+plot.yaxis.axis_label = "Number of decays"
+plot.legend.location = "top_right"
+plot.legend.click_policy = "hide"
+
+history_plot = figure(title="Fitted tau in relation to number of decays", width=400, height=400)
+history_plot.segment(x0='events', y0='mle_low', x1='events', y1='mle_high', source=history_source, line_color='#ff0000')
+history_plot.scatter('events', 'mle', source=history_source, color='#ff0000', size=4, legend_label='MLE')
+history_plot.scatter('events', 'ls', source=history_source, color='#ffa500', size=4, legend_label='LS')
+history_plot.xaxis.axis_label = "Number of decays"
+history_plot.yaxis.axis_label = "Value of tau"
+
+status = Div(text="Waiting for data from %s" % path, style={'font-size': '150%', 'font-family': 'Georgia, serif'})
+
+def update():
+    times, stamps, offset = read_appended(path, state['offset'])
+    if offset == state['offset']:
+        return
+    state['offset'] = offset
+    state['lines'] += len(times)
+
+    #Add the new decays to the histogram and patch only the bins that changed
+    decays = times[times < NO_DECAY]/1000
+    decays = decays[decays < edges[-1]]
+    added = np.bincount(np.searchsorted(edges, decays, side='right') - 1, minlength=bins)
+    hist = state['hist']
+    hist += added
+    changed = np.nonzero(added)[0]
+    if len(changed):
+        counts = hist[changed]
+        err = np.sqrt(counts)
+        changed = changed.tolist()
+        hist_source.patch(dict(top=list(zip(changed, counts.tolist())),
+                               err_low=list(zip(changed, (counts - err).tolist())),
+                               err_high=list(zip(changed, (counts + err).tolist()))))
+
+    n_events = int(hist.sum())
+    status.text = "%s: %d lines, %d decays in the histogram" % (path, state['lines'], n_events)
+    if not len(changed) or n_events < MIN_FIT_EVENTS:
+        return
+
+    mle_fit = fit_tau(hist, edges, 'MLE')
+    ls_fit = fit_tau(hist, edges, 'LS')
+    curves = model_curves([mle_fit['tau'], ls_fit['tau']], x, n_events, np.diff(edges))
+    curve_source.patch(dict(mle=[(slice(bins), curves[0])], ls=[(slice(bins), curves[1])]))
+    history_source.stream(dict(events=[n_events], mle=[mle_fit['tau']],
+                               mle_low=[mle_fit['tau'] - mle_fit['lower']],
+                               mle_high=[mle_fit['tau'] + mle_fit['upper']], ls=[ls_fit['tau']]),
+                          rollover=HISTORY_POINTS)
+    status.text += ", tau = %.4f +/- %.4f (MLE), %.4f +/- %.4f (LS)" % (
+        mle_fit['tau'], mle_fit['sigma'], ls_fit['tau'], ls_fit['sigma'])
+
+update()
+curdoc().add_root(column(status, row(plot, history_plot)))
+curdoc().add_periodic_callback(update, UPDATE_MS)
+curdoc().title = "Muon Decay (live)"
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Server version of the MLE_LS_curve_fitting layout for many concurrent users.
+
+Run with: bokeh serve --show Muon_Decay_server.py --args [file.data] [bins]
+
+Slider moves are handled in Python against the dataset, histogram and fit
+cache in shared, which every session of the server process shares. The
+work runs on shared.EXECUTOR so one session's fit never stalls another,
+and each session only holds its own curves and visited points. Results can
+come back out of order, so each submission carries a sequence number and a
+result older than the last one shown for its method is dropped.
+"""
+import asyncio
+import itertools
+import sys
+from functools import partial
+
+from bokeh.document import without_document_lock
+from bokeh.io import curdoc
+from bokeh.layouts import column, row
+from bokeh.models import Button, ColumnDataSource, Div, HoverTool, Label, Slider
+from bokeh.plotting import figure
+
+from muon_decay import shared
+
+path = sys.argv[1] if len(sys.argv) > 1 else "LevangieMcKeever_3000.data"
+bins = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+tau_max = 20
+doc = curdoc()
+
+hist, edges, stats = shared.histogram(path, bins, tau_max)
+curve, lnL, chi2 = shared.evaluate(path, 2.5, bins, tau_max)
+
+plot = figure(title="Number of Muon Decays in relation to decay time", width=1500, height=800)
+plot.quad(top=hist, bottom=hist, left=edges[:-1], right=edges[1:])
+plot.xaxis.axis_label = "Time in microseconds"
+plot.yaxis.axis_label = "Number of decays"
+mle_source = ColumnDataSource(data=dict(x=(edges[:-1] + edges[1:])/2, y=curve))
+ls_source = ColumnDataSource(data=dict(x=(edges[:-1] + edges[1:])/2, y=curve))
+plot.line('x', 'y', source=mle_source, line_width=2, line_color='#ff0000', legend_label='MLE')
+plot.line('x', 'y', source=ls_source, line_width=2, line_color='#ffa500', legend_label='LS')
+plot.legend.location = "top_right"
+plot.legend.click_policy = "hide"
+
+def history_plot(title, name, value):
+    source = ColumnDataSource(data=dict(x=[2.5], y=[value], color=['#ff0000'], size=[10]))
+    history = figure(title="%s in relation to tau" % title, width=400, height=400)
+    history.scatter('x', 'y', color='color', size='size', source=source)
+    history.xaxis.axis_label = "Value of tau"
+    history.yaxis.axis_label = "Value of %s" % title
+    history.tools.append(HoverTool(tooltips=[(title, "@y"), ("tau", "@x")]))
+    label = Label(x=70, y=70, x_units='screen', y_units='screen', text='%s = %.2f' % (name, value),
+                  border_line_color='black', border_line_alpha=1.0,
+                  background_fill_color='white', background_fill_alpha=1.0)
+    history.add_layout(label)
+    return history, source, label
+
+lnL_plot, lnL_source, lnL_label = history_plot("Ln(L)", "ln(L)", lnL)
+chi2_plot, chi2_source, chi2_label = history_plot("X^2", "X^2", chi2)
+tau_slider = Slider(start=0.01, end=5, value=2.5, step=.01, title="Tau")
+tau_slider_ls = Slider(start=0.01, end=5, value=2.5, step=.01, title="Tau")
+button = Button(label="Maximize ln(L)", button_type="success")
+chi2_button = Button(label="Minimize X^2", button_type="success")
+
+#Per session record of the visited taus and the best point of each history
+history_state = {id(lnL_source): dict(visited={2.5: 0}, best=0, better=lambda a, b: a > b),
+                 id(chi2_source): dict(visited={2.5: 0}, best=0, better=lambda a, b: a < b)}
+
+def record_point(source, tau, value):
+    state = history_state[id(source)]
+    if tau in state['visited']:
+        return
+    index = len(state['visited'])
+    state['visited'][tau] = index
+    is_best = state['better'](value, source.data['y'][state['best']])
+    if is_best:
+        source.patch(dict(color=[(state['best'], '#0000ff')], size=[(state['best'], 4)]))
+        state['best'] = index
+    source.stream(dict(x=[tau], y=[value], color=['#ff0000' if is_best else '#0000ff'], size=[10 if is_best else 4]))
+
+def show_mle(tau, result):
+    curve, lnL, chi2 = result
+    mle_source.data['y'] = curve
+    lnL_label.text = 'ln(L) = %.2f' % lnL
+    record_point(lnL_source, tau, lnL)
+
+def show_ls(tau, result):
+    curve, lnL, chi2 = result
+    ls_source.data['y'] = curve
+    chi2_label.text = 'X^2 = %.2f' % chi2
+    record_point(chi2_source, tau, chi2)
+
+#Sequence numbers of this session's submissions, taken when the slider moves or
+#the button is clicked, and the newest one shown so far per method
+submissions = itertools.count(1)
+shown = dict(MLE=0, LS=0)
+
+def show_latest(method, sequence, show):
+    if sequence <= shown[method]:
+        return
+    shown[method] = sequence
+    show()
+
+@without_document_lock
+async def evaluate(tau, method, show, sequence):
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(shared.EXECUTOR, partial(shared.evaluate, path, tau, bins, tau_max))
+    doc.add_next_tick_callback(partial(show_latest, method, sequence, partial(show, tau, result)))
+
+@without_document_lock
+async def best_fit(method, slider, label, name, sequence):
+    loop = asyncio.get_running_loop()
+    fit = await loop.run_in_executor(shared.EXECUTOR, partial(shared.best_fit, path, method, bins, tau_max))
+    def show():
+        slider.value = round(fit['tau'], 2)
+        label.text = '%s = %.2f at tau = %.4f +%.4f/-%.4f' % (name, fit['value'], fit['tau'], fit['upper'], fit['lower'])
+    doc.add_next_tick_callback(partial(show_latest, method, sequence, show))
+
+tau_slider.on_change('value', lambda attr, old, new: doc.add_next_tick_callback(
+    partial(evaluate, new, 'MLE', show_mle, next(submissions))))
+tau_slider_ls.on_change('value', lambda attr, old, new: doc.add_next_tick_callback(
+    partial(evaluate, new, 'LS', show_ls, next(submissions))))
+button.on_click(lambda: doc.add_next_tick_callback(
+    partial(best_fit, 'MLE', tau_slider, lnL_label, 'ln(L)', next(submissions))))
+chi2_button.on_click(lambda: doc.add_next_tick_callback(
+    partial(best_fit, 'LS', tau_slider_ls, chi2_label, 'X^2', next(submissions))))
+
+header = Div(text="<header> Muon Decay </header>", style={'font-size': '300%', 'font-family': 'Georgia, serif'})
+doc.add_root(column(header, row(plot, column(tau_slider, lnL_plot, button, tau_slider_ls, chi2_plot, chi2_button))))
+doc.title = "Muon Decay"
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Speed of the vectorized ln(L)/X^2 grid engine against the original list
+comprehension implementation of MLE_LS_curve_fitting.
+
+Run from the repository root with: python benchmarks/bench_grid_engine.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from muon_decay.fit import likelihood_scan, model_bases
+
+def legacy_scan(hist, edges, slider_values):
+    #The model matrix, ln(L) and X^2 loops as they were written in Muon_Decay_PY.py
+    bins = len(hist)
+    x = [(edges[j-1]+edges[j])/2 for j in range(1,bins+1)]
+    y = [[((3000*0.05)/slider_value)*np.exp((-x[j-1])/slider_value) for j in range(1,bins+1)] for slider_value in slider_values]
+    lnL_nans = [sum([(hist[k-1] * np.log(y[m][k-1]*0.05) - (y[m][k-1]*0.05)) for k in range(1,len(hist)+1)]) for m in range(0,len(slider_values))]
+    lnL = [l if str(l) != 'nan' else 0 for l in lnL_nans]
+    hist_err_val = [np.sqrt(item) for item in hist]
+    lnbins = [np.log(item) if item > 0 else 0 for item in hist]
+    y_ls = [[np.log(item) if item > 0 else 0 for item in y_tau] for y_tau in y]
+    chi2s = []
+    for y_ls_tau in y_ls:
+        B = []
+        for i in range(0,bins):
+            l = (lnbins[i]-y_ls_tau[i])**2
+            if hist[i] == 0:
+                B.append(0)
+            else:
+                h = (hist_err_val[i]/hist[i])**2
+                B.append(l/h)
+        chi2s.append(sum(B))
+    return x, y, lnL, chi2s
+
+def best_time(function, *args, repeat=3):
+    times = []
+    for i in range(0,repeat):
+        #Each run starts cold, a model basis left by the one before would only time a cache hit
+        model_bases.clear()
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    rng = np.random.default_rng(2021)
+    decays = rng.exponential(2.2, 3000)
+    slider_values = np.arange(0.01, 5.01, .01)
+    print("%8s %14s %14s %10s" % ("bins", "legacy (s)", "vectorized (s)", "speedup"))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for bins in (400, 4000, 40000):
+            hist, edges = np.histogram(decays, bins=bins, range=(0,20))
+            #The legacy loops are linear in the number of taus, so time a slice
+            #of the grid and scale up to keep the large bin counts bearable
+            n_legacy = max(5, len(slider_values)*400//bins)
+            legacy = best_time(legacy_scan, hist, edges, slider_values[:n_legacy], repeat=1)
+            legacy *= len(slider_values)/n_legacy
+            vectorized = best_time(likelihood_scan, hist, edges, slider_values)
+            print("%8d %14.3f %14.4f %9.0fx" % (bins, legacy, vectorized, legacy/vectorized))
+
+if __name__ == '__main__':
+    main()
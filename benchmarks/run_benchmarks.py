@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Wall time, peak memory and page size of every stage of the Muon Decay
+pages, stored per commit so regressions show up between runs.
+
+Run from the repository root with: python benchmarks/run_benchmarks.py
+Compare the working tree with the last results of another commit with
+--compare, which exits with status 1 when any case got slower than
+--threshold.
+
+Stages, each timed in a fresh process so peak RSS belongs to that case only:
+    parse      load_decays of a detector format file, 'load' of that many
+               decays and 'detector' of a synth.py run of that many seconds,
+               so about that many lines, 97% of them "no decay" records
+    histogram  np.histogram of the decay times
+    grid       ln(L) and X^2 over the 500 slider taus, 'dense' with the
+               (taus, bins) engine, 'stats' from the histogram statistics
+               and 'scan' with likelihood_scan, model curves included
+    render     Bokeh HTML of the fitting panel, 'js' for the in-browser page,
+               'py' and 'py-grid' for the Python page in its compact and
+               precomputed grid modes
+
+Results go to benchmarks/results/<machine>.jsonl, one JSON object per case.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+EVENTS = (3000, 300000, 30000000)
+BINS = (400, 40000)
+STAGES = {'parse': ('load', 'detector'), 'histogram': ('numpy',), 'grid': ('dense', 'stats', 'scan'), 'render': ('js', 'py', 'py-grid')}
+#Lines written per formatting pass when making a data file
+WRITE_BLOCK = 2**20
+
+def data_file(events, seed=2021):
+    """A detector format file of events decays, written once and reused."""
+    path = os.path.join(DATA_DIR, 'bench_%d.data' % events)
+    if os.path.exists(path):
+        return path
+    from muon_decay.sim import iter_decays
+    os.makedirs(DATA_DIR, exist_ok=True)
+    stamp = 1550267950
+    with open(path + '.part', 'w') as file:
+        for times in iter_decays(events, seed=seed, batch_size=WRITE_BLOCK):
+            lines = np.empty((len(times), 2), dtype=np.int64)
+            lines[:, 0] = np.round(times*1000)
+            lines[:, 1] = stamp + np.arange(len(times))
+            stamp += len(times)
+            file.write(('%d %d\n'*len(times)) % tuple(lines.ravel()))
+    os.replace(path + '.part', path)
+    return path
+
+def detector_file(seconds, seed=2021):
+    """A synthetic detector run of that many seconds, written once and reused."""
+    path = os.path.join(DATA_DIR, 'detector_%d.data' % seconds)
+    if not os.path.exists(path):
+        from muon_decay.synth import write_detector_file
+        os.makedirs(DATA_DIR, exist_ok=True)
+        write_detector_file(path + '.part', seconds, seed=seed)
+        os.replace(path + '.part', path)
+    return path
+
+def peak_rss_kb():
+    #ru_maxrss is in kB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss//1024 if sys.platform == 'darwin' else rss
+
+def setup(stage, variant, events, bins):
+    """Inputs of a case and the function to time on them."""
+    edges = np.linspace(0, 20, bins + 1)
+    taus = np.arange(0.01, 5.01, .01)
+    if stage == 'parse':
+        from muon_decay.data import load_decays
+        path = data_file(events) if variant == 'load' else detector_file(events)
+        return lambda: load_decays(path)
+    if stage == 'histogram':
+        from muon_decay.sim import simulate_decays
+        decays = simulate_decays(events, seed=2021)
+        return lambda: np.histogram(decays, bins=bins, range=(0, 20))
+    from muon_decay.sim import simulate_histogram
+    hist = simulate_histogram(events, edges, seed=2021)
+    if stage == 'grid':
+        from muon_decay.fit import (chi2_from_statistics, chi2_grid, histogram_statistics, likelihood_scan,
+                                    lnL_from_statistics, lnL_grid)
+        if variant == 'dense':
+            return lambda: (lnL_grid(hist, edges, taus), chi2_grid(hist, edges, taus))
+        if variant == 'stats':
+            def evaluate():
+                stats = histogram_statistics(hist, edges)
+                return lnL_from_statistics(stats, taus), chi2_from_statistics(stats, taus)
+            return evaluate
+        return lambda: likelihood_scan(hist, edges, taus)
+    from bokeh.embed import file_html
+    from bokeh.layouts import row
+    from bokeh.resources import CDN
+    if variant == 'js':
+        from muon_decay.page_js import fitting_panel
+        build = lambda: fitting_panel(hist, edges)
+    else:
+        from muon_decay.page import fitting_panel
+        build = lambda: fitting_panel(hist, edges, compact=(variant == 'py'))
+    return lambda: file_html(row(*build()), CDN, "Muon Decay")
+
+def run_case(stage, variant, events, bins, repeat):
+    """Time one case in this process and return its measurements."""
+    from muon_decay.fit import model_bases
+    function = setup(stage, variant, events, bins)
+    setup_rss = peak_rss_kb()
+    times = []
+    output = None
+    for i in range(0,repeat):
+        #Each run starts cold, a model basis left by the one before would only time a cache hit
+        model_bases.clear()
+        start = time.perf_counter()
+        output = function()
+        times.append(time.perf_counter() - start)
+        #Large cases are slow enough that one run is a stable measurement
+        if sum(times) > 10:
+            break
+    result = dict(seconds=min(times), runs=len(times), peak_rss_kb=peak_rss_kb(), setup_rss_kb=setup_rss)
+    if stage == 'render':
+        result['html_bytes'] = len(output.encode('utf-8'))
+    return result
+
+def run_in_child(stage, variant, events, bins, repeat):
+    command = [sys.executable, os.path.abspath(__file__), '--child', stage, variant, str(events), str(bins), str(repeat)]
+    #Run outside the repository so nothing a case writes lands in it
+    with tempfile.TemporaryDirectory() as cwd:
+        done = subprocess.run(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if done.returncode < 0:
+        #Most often the kernel's out of memory killer
+        return dict(error='killed by signal %d' % -done.returncode)
+    if done.returncode != 0:
+        lines = done.stderr.strip().splitlines()
+        return dict(error=lines[-1] if lines else 'exit status %d' % done.returncode)
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+def cases(stages, events, bins):
+    for stage in stages:
+        for variant in STAGES[stage]:
+            for n in events:
+                #Parsing does not depend on the binning
+                for b in (bins if stage != 'parse' else (0,)):
+                    yield stage, variant, n, b
+
+def git(*args):
+    try:
+        return subprocess.run(('git',) + args, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True).stdout.strip()
+    except OSError:
+        return ''
+
+def environment():
+    import bokeh
+    return dict(commit=git('rev-parse', 'HEAD'), dirty=bool(git('status', '--porcelain', '--untracked-files=no')),
+                date=time.strftime('%Y-%m-%dT%H:%M:%S'), machine=platform.node(),
+                python=platform.python_version(), numpy=np.__version__, bokeh=bokeh.__version__)
+
+def results_path(machine):
+    return os.path.join(RESULTS_DIR, '%s.jsonl' % machine)
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def case_key(result):
+    return (result['stage'], result['variant'], result['events'], result['bins'])
+
+def previous_results(results, commit):
+    """Latest result of every case measured at commit, or at the last other commit measured if commit is None."""
+    if commit is None:
+        current = git('rev-parse', 'HEAD')
+        commits = [result['commit'] for result in results if result['commit'] != current]
+        if not commits:
+            return {}
+        commit = commits[-1]
+    else:
+        commit = git('rev-parse', commit) or commit
+    return dict((case_key(result), result) for result in results if result['commit'] == commit and 'error' not in result)
+
+def print_result(result, before=None, stream=sys.stdout):
+    if 'error' in result:
+        stream.write("%-9s %-7s %10d %6d  failed: %s\n" % (case_key(result) + (result['error'],)))
+        return
+    line = "%-9s %-7s %10d %6d %10.4f %10.1f %12s" % (case_key(result) + (
+        result['seconds'], result['peak_rss_kb']/1024, result.get('html_bytes', '')))
+    if before is not None:
+        line += " %7.2fx" % (result['seconds']/before['seconds'])
+    stream.write(line + "\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the parse, histogram, grid and render stages.")
+    parser.add_argument('--stages', nargs='+', choices=sorted(STAGES), default=list(STAGES))
+    parser.add_argument('--events', nargs='+', type=int, default=list(EVENTS))
+    parser.add_argument('--bins', nargs='+', type=int, default=list(BINS))
+    parser.add_argument('--quick', action='store_true', help="leave out the 30M event cases")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per case, the fastest is kept")
+    parser.add_argument('--compare', nargs='?', const='', default=None, metavar='COMMIT',
+                        help="compare with the results of COMMIT, the last other commit measured by default")
+    parser.add_argument('--threshold', type=float, default=1.2, help="slowdown ratio reported as a regression")
+    parser.add_argument('--no-save', action='store_true', help="do not append the results to the results file")
+    parser.add_argument('--child', nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        stage, variant, events, bins, repeat = args.child
+        print(json.dumps(run_case(stage, variant, int(events), int(bins), int(repeat))))
+        return 0
+
+    env = environment()
+    path = results_path(env['machine'])
+    before = previous_results(load_results(path), args.compare or None) if args.compare is not None else {}
+    events = [n for n in args.events if not (args.quick and n > 10**6)]
+    print("%-9s %-7s %10s %6s %10s %10s %12s" % ("stage", "variant", "events", "bins", "time (s)", "peak (MB)", "html (B)"))
+    regressions = []
+    results = []
+    for stage, variant, n, bins in cases(args.stages, events, args.bins):
+        result = dict(env, stage=stage, variant=variant, events=n, bins=bins)
+        result.update(run_in_child(stage, variant, n, bins, args.repeat))
+        previous = before.get(case_key(result))
+        print_result(result, previous if 'error' not in result else None)
+        sys.stdout.flush()
+        if previous is not None and 'error' not in result and result['seconds'] > args.threshold*previous['seconds']:
+            regressions.append(result)
+        results.append(result)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(path, 'a') as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+        print("Results appended to %s" % path)
+    if regressions:
+        print("%d cases more than %.0f%% slower than before:" % (len(regressions), 100*(args.threshold - 1)))
+        for result in regressions:
+            print_result(result, before[case_key(result)])
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
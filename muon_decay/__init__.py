@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Muon lifetime analysis of scintillator detector runs.
+
+The numeric core, reading detector files, histogramming and fitting tau,
+only needs NumPy and is importable from here. Bokeh is only imported by the
+page modules (page, page_js, plots), which the command line entry point
+loads when a page is rendered:
+
+    python -m muon_decay --data run.data --no-show --output run.html
+"""
+import importlib
+
+#Each name exported here and the module it comes from. Modules are only
+#imported when one of their names is first used, so python -m muon_decay.store
+#and the like run a module the package has not already imported.
+_EXPORTS = dict(
+    [(name, 'cache') for name in ('load_decays_cached',)] +
+    [(name, 'data') for name in ('NO_DECAY', 'iter_chunks', 'iter_decay_times', 'load_decays', 'read_appended')] +
+    [(name, 'fit') for name in ('batch_statistics', 'bin_centres', 'fit_background', 'fit_batch', 'fit_statistics',
+                                'fit_tau', 'fit_unbinned', 'histogram_statistics', 'likelihood_scan', 'model_curves',
+                                'unbinned_statistics')] +
+    [(name, 'sim') for name in ('simulate_decays', 'simulate_histogram')] +
+    [(name, 'store') for name in ('EventStore',)])
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module('.' + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
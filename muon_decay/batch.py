@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Fit many detector runs in parallel and write one summary row per file.
+
+Usage: python -m muon_decay.batch "runs/*.data" [runs2/ ...] -o summary.csv
+
+Each file goes through the same parse, histogram and MLE/LS fit steps as the
+Muon Decay pages, but no page is built and no browser is opened.
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .cache import load_decays_cached
+from .data import load_decays
+from .fit import fit_tau, fit_unbinned, unbinned_statistics
+
+FIELDS = ['file', 'lines', 'events', 'mle_tau', 'mle_sigma', 'lnL_max', 'ls_tau', 'ls_sigma', 'chi2_min',
+          'unbinned_tau', 'unbinned_sigma', 'error']
+
+def find_files(patterns):
+    """Data files named by the patterns, a directory standing for all .data files in it."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.data')
+        files.extend(sorted(glob.glob(pattern)))
+    #Keep the first occurrence of files named by more than one pattern
+    return list(dict.fromkeys(files))
+
+def fit_file(path, bins=400, tau_max=20, use_cache=True):
+    """Parse, bin and fit one file, returning its summary row."""
+    row = dict(file=path)
+    try:
+        loader = load_decays_cached if use_cache else load_decays
+        decay_times, timestamps, info = loader(path)
+        hist, edges = np.histogram(decay_times/1000, bins=bins, range=(0, tau_max))
+        mle_fit = fit_tau(hist, edges, 'MLE')
+        ls_fit = fit_tau(hist, edges, 'LS')
+        unbinned_fit = fit_unbinned(unbinned_statistics(decay_times/1000, (0, tau_max)))
+        row.update(lines=info['lines'], events=int(hist.sum()),
+                   mle_tau=mle_fit['tau'], mle_sigma=mle_fit['sigma'], lnL_max=mle_fit['value'],
+                   ls_tau=ls_fit['tau'], ls_sigma=ls_fit['sigma'], chi2_min=ls_fit['value'],
+                   unbinned_tau=unbinned_fit['tau'], unbinned_sigma=unbinned_fit['sigma'])
+    except Exception as error:
+        #One unreadable run should not cost the rest of the batch
+        row['error'] = '%s: %s' % (type(error).__name__, error)
+    return row
+
+def progress(done, total, start, stream=sys.stderr):
+    elapsed = time.perf_counter() - start
+    eta = elapsed/done*(total - done) if done else float('nan')
+    stream.write("\r%d/%d files, %.1f s elapsed, ETA %.1f s" % (done, total, elapsed, eta))
+    if done == total:
+        stream.write("\n")
+    stream.flush()
+
+def run_batch(files, output, bins=400, tau_max=20, workers=None, use_cache=True, show_progress=True):
+    """Fit every file on a pool of worker processes and write the rows to output as CSV."""
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fit_file, path, bins, tau_max, use_cache) for path in files]
+        for done, future in enumerate(as_completed(futures), 1):
+            rows.append(future.result())
+            if show_progress:
+                progress(done, len(files), start)
+    rows.sort(key=lambda row: row['file'])
+    with open(output, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit the muon lifetime of many detector runs.")
+    parser.add_argument('patterns', nargs='+', help="data files, glob patterns or directories of .data files")
+    parser.add_argument('-o', '--output', default='summary.csv', help="summary CSV to write")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="worker processes, one per core by default")
+    parser.add_argument('--bins', type=int, default=400, help="histogram bins between 0 and --tau-max")
+    parser.add_argument('--tau-max', type=float, default=20, help="upper edge of the histogram in microseconds")
+    parser.add_argument('--no-cache', action='store_true', help="always parse the text files")
+    parser.add_argument('-q', '--quiet', action='store_true', help="no progress indicator")
+    args = parser.parse_args(argv)
+
+    files = find_files(args.patterns)
+    if not files:
+        parser.error("no data files match %s" % ' '.join(args.patterns))
+    rows = run_batch(files, args.output, args.bins, args.tau_max, args.jobs,
+                     use_cache=not args.no_cache, show_progress=not args.quiet)
+    failed = sum(1 for row in rows if row.get('error'))
+    print("%d files fitted, %d failed, summary written to %s" % (len(rows) - failed, failed, args.output))
+
+if __name__ == '__main__':
+    main()
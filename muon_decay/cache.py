@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of parsed detector files, and a small in-memory LRU cache.
+
+The decay time and timestamp columns of a parsed file are stored as .npy
+files next to a small JSON record of the source file's path, size, mtime and
+content hash, so a repeat run memory-maps the arrays instead of parsing the
+text again.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .data import load_decays
+
+CACHE_DIR = os.environ.get('MUON_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'muon_decay'))
+#Total size of the cache directory before the least recently used entries go
+MAX_CACHE_BYTES = 2**30
+
+def file_hash(path, chunk_bytes=2**24):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(chunk_bytes), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _entry_paths(path, cache_dir):
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    base = os.path.join(cache_dir, key)
+    return base + '.json', base + '.times.npy', base + '.stamps.npy'
+
+def _read_entry(path, cache_dir):
+    meta_path, times_path, stamps_path = _entry_paths(path, cache_dir)
+    try:
+        with open(meta_path) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(path)
+    #Entries from before the health statistics, the check for malformed
+    #lines or the outlier timestamps are parsed again
+    if meta.get('size') != stat.st_size or 'outliers' not in meta.get('health', {}):
+        return None
+    if meta.get('mtime_ns') != stat.st_mtime_ns:
+        #Touched or copied but maybe not changed, the content hash decides
+        if meta.get('hash') != file_hash(path):
+            return None
+        meta['mtime_ns'] = stat.st_mtime_ns
+        _write_json(meta_path, meta)
+    try:
+        times = np.load(times_path, mmap_mode='r')
+        stamps = np.load(stamps_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    #Mark the entry as recently used for eviction
+    os.utime(meta_path)
+    return times, stamps, meta
+
+def _write_json(path, meta):
+    temp = path + '.tmp'
+    with open(temp, 'w') as file:
+        json.dump(meta, file)
+    os.replace(temp, path)
+
+def _write_entry(path, cache_dir, times, stamps, info):
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path, times_path, stamps_path = _entry_paths(path, cache_dir)
+    stat = os.stat(path)
+    for column_path, column in ((times_path, times), (stamps_path, stamps)):
+        temp = column_path + '.tmp.npy'
+        np.save(temp, column)
+        os.replace(temp, column_path)
+    meta = dict(path=os.path.abspath(path), size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                hash=info['hash'], lines=info['lines'], decays=info['decays'],
+                bad_lines=info['bad_lines'], health=info['health'])
+    _write_json(meta_path, meta)
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, keep=None):
+    """
+    Delete least recently used entries until the cache fits in max_bytes,
+    never the entry of the source file keep, which may be the one just
+    written.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    kept = _entry_paths(keep, cache_dir)[0] if keep is not None else None
+    entries = []
+    total = 0
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.json'):
+            continue
+        base = os.path.join(cache_dir, name[:-len('.json')])
+        files = [base + '.json', base + '.times.npy', base + '.stamps.npy']
+        size = sum(os.path.getsize(f) for f in files if os.path.exists(f))
+        entries.append((os.path.getmtime(base + '.json'), size, files))
+        total += size
+    for used, size, files in sorted(entries):
+        if total <= max_bytes:
+            break
+        if files[0] == kept:
+            continue
+        for f in files:
+            if os.path.exists(f):
+                os.remove(f)
+        total -= size
+
+def load_decays_cached(path, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    load_decays() through the cache. A hit returns read-only memory-mapped
+    arrays, a miss or a changed source file parses the text and stores the
+    result. info['cached'] tells which of the two happened and info['hash']
+    is the content hash of the file.
+    """
+    start = time.perf_counter()
+    entry = _read_entry(path, cache_dir)
+    if entry is not None:
+        times, stamps, meta = entry
+        seconds = time.perf_counter() - start
+        info = dict(lines=meta['lines'], decays=meta['decays'], bad_lines=meta['bad_lines'], seconds=seconds,
+                    lines_per_second=meta['lines']/seconds if seconds > 0 else float('inf'), health=meta['health'],
+                    hash=meta['hash'], cached=True)
+        return times, stamps, info
+    times, stamps, info = load_decays(path)
+    info['hash'] = file_hash(path)
+    try:
+        _write_entry(path, cache_dir, times, stamps, info)
+        evict(cache_dir, max_bytes, keep=path)
+    except OSError:
+        #A read-only or full cache directory should never stop an analysis
+        pass
+    info['cached'] = False
+    return times, stamps, info
+
+class LRUCache:
+    """
+    Thread-safe mapping that keeps the maxsize most recently used entries
+    and counts its hits, misses and evictions. With max_bytes it also keeps
+    the nbytes of its array values under that total, always keeping the
+    newest entry.
+    """
+    def __init__(self, maxsize=1024, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """The value for key, calling compute() and storing its result on a miss."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        #Computed outside the lock so other keys are not held up by a slow one
+        value = compute()
+        with self._lock:
+            if key in self._data:
+                self.bytes -= getattr(self._data[key], 'nbytes', 0)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self.bytes += getattr(value, 'nbytes', 0)
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes
+                                                     and len(self._data) > 1):
+                old_key, old = self._data.popitem(last=False)
+                self.bytes -= getattr(old, 'nbytes', 0)
+                self.evictions += 1
+        return value
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        """Drop every entry; the hit, miss and eviction counts are kept."""
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return dict(size=len(self._data), maxsize=self.maxsize, bytes=self.bytes, max_bytes=self.max_bytes,
+                    hits=self.hits, misses=self.misses, evictions=self.evictions)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Command line entry point of the Muon Decay pages.
+
+Usage: python -m muon_decay [--data FILE] [--bins N] [--tau-max US] [--output PAGE.html]
+                            [--no-show] [--fit-only] [--page py|js] [--grid]
+                            [--max-points N] [--log-y]
+
+Loading, binning and fitting only need NumPy. Bokeh and the page modules
+are imported once a page is actually rendered, so a --fit-only run never
+pays for them.
+"""
+import argparse
+import importlib
+import os
+import sys
+
+import numpy as np
+
+from .cache import load_decays_cached
+from .decimate import MAX_POINTS
+from .fit import fit_background, fit_tau, fit_unbinned, model_bases, unbinned_statistics
+from .instrument import add_arguments, from_arguments
+from .rebin import bin_width_scan, cumulative_counts
+from .sim import simulate_decays
+from .window import rolling_lifetime
+
+DEFAULT_DATA = "LevangieMcKeever_3000.data"
+#Bin width in us of the Python page when --bins is not given
+BIN_WIDTH = 0.05
+SIM_SEED = 2021
+SIM_TAU = 2.2
+#Page module and default output file of each --page
+PAGES = {'py': ('page', "Muon_Decay_PY.html"), 'js': ('page_js', "Muon_Decay.html")}
+
+def load(path, instruments):
+    """
+    Decay times in ns and us and their timestamps from a detector file, and
+    the detector health statistics gathered while parsing it.
+    """
+    with instruments.stage('load'):
+        decay_times, timestamps, info = load_decays_cached(path)
+    health = info.pop('health')
+    instruments.count('lines', info['lines'])
+    instruments.count('decays', info['decays'])
+    instruments.log('load', path=path, **info)
+    #The per bin counts are left to the page, the log gets everything else
+    instruments.log('health', path=path, **dict((key, value) for key, value in health.items()
+                                                 if key not in ('line_counts', 'decay_counts')))
+    with instruments.stage('filter'):
+        decays = decay_times/1000
+    return decay_times, timestamps, decays, health
+
+def histogram_edges(decays, page='py', bins=None, tau_max=None):
+    """
+    Bin edges from 0 to tau_max us. The in-browser page keeps its 400 bins
+    to 20 us, the Python page 0.05 us bins up to the longest decay.
+    """
+    if tau_max is None:
+        tau_max = 20.0 if page == 'js' or not len(decays) else float(decays.max())
+    if bins is None:
+        bins = 400 if page == 'js' else max(int(tau_max/BIN_WIDTH), 1)
+    return np.linspace(0, tau_max, bins + 1)
+
+def fit_all(hist, edges, decays, instruments):
+    """The binned MLE and LS, unbinned and background fits of one histogram."""
+    fits = {}
+    with instruments.stage('ln(L)'):
+        fits['MLE'] = fit_tau(hist, edges, 'MLE')
+    with instruments.stage('X^2'):
+        fits['LS'] = fit_tau(hist, edges, 'LS')
+    with instruments.stage('unbinned'):
+        fits['unbinned'] = fit_unbinned(unbinned_statistics(decays, (edges[0], edges[-1])))
+    with instruments.stage('background'):
+        fits['background'] = fit_background(hist, edges)
+    for name, fit in fits.items():
+        instruments.log('fit', name=name, **fit)
+    return fits
+
+def print_fits(fits, stream=sys.stdout):
+    for name, fit in fits.items():
+        stream.write("%-10s tau = %.4f +%.4f/-%.4f\n" % (name, fit['tau'], fit['upper'], fit['lower']))
+    background = fits.get('background')
+    if background is not None:
+        stream.write("%-10s N = %.0f +/- %.0f, B = %.3f +/- %.3f per us%s\n"
+                     % ('', background['N'], background['N_sigma'], background['B'], background['B_sigma'],
+                        '' if background['converged'] else ', not converged'))
+
+def render(args, decay_times, timestamps, decays, health, hist, edges, instruments):
+    """Build the page of args.page for the data and a simulated run, then save or show it."""
+    page = importlib.import_module('.' + PAGES[args.page][0], __package__)
+    from bokeh.layouts import column, row
+    from bokeh.plotting import output_file, save, show
+    from .plots import bin_width_panel, detector_health_panel, page_header, rolling_lifetime_plot
+
+    options = dict(compact=not args.grid) if args.page == 'py' else {}
+    options.update(max_points=args.max_points, log_y=args.log_y)
+    plot, controls = page.fitting_panel(hist, edges, decays, instruments=instruments, **options)
+
+    #Lifetime in 6 hour windows across the run, to spot detector drift
+    with instruments.stage('rolling'):
+        rolling = rolling_lifetime(decay_times, timestamps, edges, window_hours=6, step_hours=1)
+        rolling_plot = rolling_lifetime_plot(rolling)
+
+    #Any bin width from one cumulative count of the decays, and tau for each of them
+    with instruments.stage('bin width scan'):
+        fine_edges, cumulative = cumulative_counts(decays)
+        width_panel = bin_width_panel(fine_edges, cumulative, bin_width_scan(fine_edges, cumulative))
+
+    #Muon rate, dead time and "no decay" timing from every line of the file
+    with instruments.stage('health'):
+        health_panel = detector_health_panel(health)
+
+    #Simulated data, seeded so every run shows the same sample, binned like the
+    #data so both share their model bases
+    with instruments.stage('simulate'):
+        sim_decays = simulate_decays(args.sim_events, SIM_TAU, seed=args.seed)
+    with instruments.stage('histogram'):
+        sim_hist = np.histogram(sim_decays, bins=edges)[0]
+    sim_plot, sim_controls = page.fitting_panel(sim_hist, edges, sim_decays, instruments=instruments, **options)
+
+    header, intro_header, intro = page_header(page.PAGE_WIDTH)
+    layout = column(header, intro_header, intro, row(plot, controls, rolling_plot, width_panel), health_panel,
+                    row(sim_plot, sim_controls))
+
+    output_file(args.output, title="Muon Decay")
+    with instruments.stage('render'):
+        if args.no_show:
+            save(layout)
+        else:
+            show(layout)
+    instruments.count('html bytes', os.path.getsize(args.output))
+    instruments.log('model cache', **model_bases.stats())
+
+def main(argv=None, page='py'):
+    parser = argparse.ArgumentParser(description="Fit the muon lifetime of a detector run and build the Muon Decay page.")
+    parser.add_argument('--data', default=DEFAULT_DATA, help="detector data file")
+    parser.add_argument('--bins', type=int, default=None,
+                        help="histogram bins, 400 for the js page and 0.05 us wide for the py page by default")
+    parser.add_argument('--tau-max', type=float, default=None,
+                        help="upper edge of the histogram in us, 20 for the js page and the longest decay for the py page")
+    parser.add_argument('--output', default=None, help="HTML file to write, named after the page by default")
+    parser.add_argument('--no-show', action='store_true', help="write the page without opening a browser")
+    parser.add_argument('--fit-only', action='store_true', help="print the fits and build no page")
+    parser.add_argument('--page', choices=sorted(PAGES), default=page,
+                        help="py sends the page precomputed fits, js recomputes them in the browser")
+    parser.add_argument('--grid', action='store_true', help="py page: send every curve of the tau grid")
+    parser.add_argument('--max-points', type=int, default=MAX_POINTS,
+                        help="most histogram buckets and curve points drawn, finer bins are merged until zoomed in")
+    parser.add_argument('--log-y', action='store_true', help="draw the histograms on a log count axis")
+    parser.add_argument('--sim-events', type=int, default=3000, help="events of the simulated run")
+    parser.add_argument('--seed', type=int, default=SIM_SEED, help="seed of the simulated run")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.grid and args.page != 'py':
+        parser.error("--grid only applies to the py page")
+    if args.output is None:
+        args.output = PAGES[args.page][1]
+
+    instruments = from_arguments(args)
+    try:
+        decay_times, timestamps, decays, health = load(args.data, instruments)
+        edges = histogram_edges(decays, args.page, args.bins, args.tau_max)
+        with instruments.stage('histogram'):
+            hist = np.histogram(decays, bins=edges)[0]
+        if args.fit_only:
+            print_fits(fit_all(hist, edges, decays, instruments))
+        else:
+            render(args, decay_times, timestamps, decays, health, hist, edges, instruments)
+    finally:
+        instruments.close()
+    return 0
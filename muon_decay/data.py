@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Chunked parser for the detector's .data files.
+
+Each line of a detector file is "<time_ns> <unix_ts>", where a decay time of
+40000 ns or more is the detector's "no decay" record for that second. Lines
+that do not hold exactly two numbers are skipped and counted, never allowed
+to shift the pairs of the lines after them.
+"""
+import mmap
+import os
+import sys
+import time
+
+import numpy as np
+
+from .health import DetectorHealth
+
+#Decay times at or above this many ns are "no decay" records
+NO_DECAY = 40000
+#Bytes of text parsed per chunk, peak memory is a small multiple of this
+CHUNK_BYTES = 2**24
+_NEWLINE, _SPACE, _TAB, _RETURN, _ZERO, _NINE = b'\n \t\r09'
+
+def parse_lines(text):
+    """
+    Parse a block of "<time_ns> <unix_ts>" lines into int32 decay times and
+    int64 timestamps.
+
+    A line must hold exactly two unsigned integers separated by blanks, with
+    a time that fits in int32. Any other line, a blank one included, is
+    skipped, as is a final line without a line break, which is most likely
+    cut off mid-write. Returns times, timestamps and the number of lines
+    skipped.
+    """
+    chars = np.frombuffer(text, dtype=np.uint8)
+    ends = np.flatnonzero(chars == _NEWLINE)
+    complete = int(ends[-1]) + 1 if len(ends) else 0
+    bad = int(complete < len(chars))
+    chars = chars[:complete]
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    digit = (chars - _ZERO) < 10
+    other = ~digit & (chars != _SPACE) & (chars != _TAB) & (chars != _RETURN) & (chars != _NEWLINE)
+    #Where each number starts, two to a line in a well formed block
+    first_digits = np.flatnonzero(digit[1:] > digit[:-1]) + 1
+    if len(digit) and digit[0]:
+        first_digits = np.concatenate([[0], first_digits])
+    well_formed = (len(first_digits) == 2*len(ends) and not other.any()
+                   and (first_digits[0::2] >= starts).all() and (first_digits[1::2] < ends).all())
+    if not well_formed:
+        #Count the numbers of every line and keep the lines with two
+        first_digit = np.zeros(len(chars), dtype=np.uint8)
+        first_digit[first_digits] = 1
+        valid = np.add.reduceat(first_digit, starts, dtype=np.int32) == 2 if len(ends) else np.zeros(0, dtype=bool)
+        #reduceat gives an empty line the value at its start, its own line break
+        valid[starts == ends] = False
+        valid[np.searchsorted(ends, np.flatnonzero(other))] = False
+        bad += int(np.count_nonzero(~valid))
+        text = chars[np.repeat(valid, ends - starts + 1)].tobytes()
+    else:
+        text = chars.tobytes()
+    values = np.fromstring(text, dtype=np.int64, sep=' ').reshape(-1, 2)
+    fits = values[:, 0] <= np.iinfo(np.int32).max
+    if not fits.all():
+        bad += int(np.count_nonzero(~fits))
+        values = values[fits]
+    return values[:, 0].astype(np.int32), values[:, 1], bad
+
+def iter_chunks(path, chunk_bytes=CHUNK_BYTES, offset=0, partial=True):
+    """
+    Yield (times, timestamps, end, bad) for every line of the file from
+    byte offset on, chunk_bytes of text at a time, where end is the byte
+    offset just past the last line in the chunk and bad the number of
+    malformed lines skipped, see parse_lines. Chunks are cut on line breaks
+    of a memory map of the file so no line is split. A final line without a
+    line break is skipped as a bad line if partial is True and left unread
+    otherwise, for a file that is still being written.
+    """
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size <= offset:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if not partial and mm[size-1:size] != b'\n':
+                size = mm.rfind(b'\n', offset, size) + 1
+            start = offset
+            while start < size:
+                stop = min(start + chunk_bytes, size)
+                if stop < size:
+                    newline = mm.rfind(b'\n', start, stop)
+                    #A single line longer than the chunk, read on to its end
+                    if newline < 0:
+                        newline = mm.find(b'\n', stop, size)
+                    stop = newline + 1 if newline >= 0 else size
+                times, stamps, bad = parse_lines(mm[start:stop])
+                yield times, stamps, stop, bad
+                start = stop
+
+def read_appended(path, offset, chunk_bytes=CHUNK_BYTES):
+    """
+    Complete lines written to a growing file since byte offset, at most
+    about chunk_bytes of them. Returns times, timestamps and the offset to
+    pass on the next call, which is unchanged when nothing new was written.
+    """
+    chunks = iter_chunks(path, chunk_bytes, offset, partial=False)
+    try:
+        times, stamps, end, bad = next(chunks)
+        return times, stamps, end
+    except StopIteration:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64), offset
+    finally:
+        chunks.close()
+
+def iter_decay_times(path, chunk_bytes=CHUNK_BYTES):
+    """Decay times in ns of each chunk of the file, the "no decay" records left out."""
+    for times, stamps, end, bad in iter_chunks(path, chunk_bytes):
+        yield times[times < NO_DECAY]
+
+def load_decays(path, chunk_bytes=CHUNK_BYTES):
+    """
+    Decay times in ns (int32) and their unix timestamps (int64) from a
+    detector file, with the "no decay" records masked out chunk by chunk.
+
+    Returns times, timestamps and a dict with the number of lines read, the
+    number of decays kept, the number of malformed lines skipped, the
+    elapsed seconds, the lines per second and the DetectorHealth summary of
+    all the lines, gathered in the same pass.
+    """
+    start = time.perf_counter()
+    times, stamps = [], []
+    lines = 0
+    health = DetectorHealth()
+    for chunk_times, chunk_stamps, end, bad in iter_chunks(path, chunk_bytes):
+        lines += len(chunk_times)
+        decay = chunk_times < NO_DECAY
+        times.append(chunk_times[decay])
+        stamps.append(chunk_stamps[decay])
+        health.update(chunk_stamps, chunk_times - NO_DECAY, bad)
+    times = np.concatenate(times) if times else np.empty(0, dtype=np.int32)
+    stamps = np.concatenate(stamps) if stamps else np.empty(0, dtype=np.int64)
+    seconds = time.perf_counter() - start
+    info = dict(lines=lines, decays=len(times), bad_lines=health.bad_lines, seconds=seconds,
+                lines_per_second=lines/seconds if seconds > 0 else float('inf'), health=health.summary())
+    return times, stamps, info
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        times, stamps, info = load_decays(path)
+        print("%s: %d lines, %d decays, %d malformed lines skipped in %.3f s (%.0f lines/s)"
+              % (path, info['lines'], info['decays'], info['bad_lines'], info['seconds'], info['lines_per_second']))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Fewer points to draw for histograms and curves with many bins.
+
+A histogram is cut into buckets of neighbouring bins and each bucket drawn
+as the band between its smallest and largest count, so no spike is lost;
+with no more bins than points every bucket is a single bin and the plot is
+unchanged. Smooth curves are reduced with largest triangle three buckets
+(LTTB). plots.MINMAX_JS repeats minmax_bins in the browser for the bins in
+view whenever the x range changes, so zooming in brings the detail back.
+"""
+import numpy as np
+
+#Buckets or points drawn per histogram or curve
+MAX_POINTS = 2000
+
+def minmax_bins(hist, edges, max_points=MAX_POINTS, start=None, stop=None, floor=0):
+    """
+    Min/max decimation of the bins overlapping [start, stop], the whole
+    histogram by default. Returns a dict of bucket arrays: left and right
+    edges, centre x, smallest and largest count and the error bar ends
+    low = min - sqrt(min) and high = max + sqrt(max), all four raised to at
+    least floor so a log axis has somewhere to draw empty bins from.
+    """
+    hist = np.asarray(hist, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    first = 0 if start is None else min(max(int(np.searchsorted(edges, start, side='right')) - 1, 0), len(hist) - 1)
+    last = len(hist) if stop is None else min(int(np.searchsorted(edges, stop, side='left')), len(hist))
+    last = max(last, first + 1)
+    size = -(-(last - first)//max_points)
+    starts = np.arange(first, last, size)
+    stops = np.minimum(starts + size, last)
+    lows = np.minimum.reduceat(hist[first:last], starts - first)
+    highs = np.maximum.reduceat(hist[first:last], starts - first)
+    left, right = edges[starts], edges[stops]
+    return dict(left=left, right=right, x=(left + right)/2, min=np.maximum(lows, floor),
+                max=np.maximum(highs, floor), low=np.maximum(lows - np.sqrt(lows), floor),
+                high=np.maximum(highs + np.sqrt(highs), floor))
+
+def subsample(n, max_points=MAX_POINTS):
+    """Indices of at most max_points evenly spread points out of n, both ends included."""
+    if n <= max_points:
+        return np.arange(n)
+    return np.unique(np.round(np.linspace(0, n - 1, max_points)).astype(np.int64))
+
+def lttb(x, y, max_points=MAX_POINTS):
+    """
+    Indices of the points kept by largest triangle three buckets: the first
+    and last point, and from each bucket in between the point making the
+    largest triangle with the point kept before it and the mean of the
+    next bucket.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    bounds = np.floor(np.linspace(1, n - 1, max_points - 1)).astype(np.int64)
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(0,max_points - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        #Mean of the next bucket, the last point for the final bucket
+        nxt = slice(hi, bounds[i + 2]) if i + 2 < len(bounds) else slice(n - 1, n)
+        mean_x, mean_y = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[previous] - mean_x)*(y[lo:hi] - y[previous]) - (x[previous] - x[lo:hi])*(mean_y - y[previous]))
+        previous = lo + int(np.argmax(area))
+        kept[i + 1] = previous
+    return kept
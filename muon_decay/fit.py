@@ -0,0 +1,584 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized likelihood and chi^2 evaluation for the binned muon decay fits.
+
+Every function here works on a whole grid of tau values at once, one row of
+the returned arrays per tau and one column per histogram bin.
+"""
+import hashlib
+import warnings
+
+import numpy as np
+
+from .cache import LRUCache
+
+#Upper bound on the number of floats held by one block of the tau grid
+BLOCK_SIZE = 2**22
+#Memory kept for model bases, see model_basis
+MODEL_CACHE_BYTES = 2**28
+
+#exp(-x/tau)/tau and its log per (bin centres, tau grid), shared by every
+#histogram with the same binning and by the ln(L) and X^2 scans. Only whole
+#tau grids go in, single curves would push them out for nothing
+model_bases = LRUCache(maxsize=256, max_bytes=MODEL_CACHE_BYTES)
+
+def bin_centres(edges):
+    edges = np.asarray(edges, dtype=float)
+    return (edges[:-1] + edges[1:])/2
+
+def _array_key(array):
+    array = np.ascontiguousarray(array, dtype=float)
+    return array.shape, hashlib.blake2b(array.tobytes(), digest_size=16).hexdigest()
+
+def _fits_cache(taus, x):
+    #Half the bound, so the exp and log bases of one grid are kept together;
+    #a single tau is a one-off curve
+    return 1 < len(taus) and len(taus)*len(x)*8 <= MODEL_CACHE_BYTES//2
+
+def model_basis(taus, x, log=False, cache=False):
+    """
+    exp(-x/tau)/tau, or its log computed directly so it never underflows,
+    for each tau as a read-only (taus, bins) array. Neither depends on the
+    counts, so with cache a tau grid comes from the model_bases cache
+    whenever the same grid and bin centres were seen before, unless it is
+    too big to share the cache with the other basis.
+    """
+    taus = np.asarray(taus, dtype=float)
+    x = np.asarray(x, dtype=float)
+    def compute():
+        t = taus[:, None]
+        basis = -np.log(t) - x[None, :]/t if log else np.exp(-x[None, :]/t)/t
+        basis.setflags(write=False)
+        return basis
+    if not (cache and _fits_cache(taus, x)):
+        return compute()
+    return model_bases.get(('log' if log else 'exp', _array_key(taus), _array_key(x)), compute)
+
+def model_curves(taus, x, n_events, width, cache=False):
+    """Expected counts per bin, n_events*width/tau*exp(-x/tau), for each tau."""
+    return (n_events*width)*model_basis(taus, x, cache=cache)
+
+def _blocks(n_taus, bins):
+    step = max(1, BLOCK_SIZE//max(bins, 1))
+    for start in range(0, n_taus, step):
+        yield slice(start, min(start + step, n_taus))
+
+def _basis_blocks(taus, x, bins, *logs):
+    #Blocks of the cached bases of the whole grid when it fits, else each
+    #block computed on its own so a big grid never churns the cache
+    whole = [model_basis(taus, x, log, cache=True) for log in logs] if _fits_cache(taus, x) else None
+    for block in _blocks(len(taus), bins):
+        if whole is None:
+            yield (block,) + tuple(model_basis(taus[block], x, log) for log in logs)
+        else:
+            yield (block,) + tuple(basis[block] for basis in whole)
+
+def _histogram_terms(hist, edges, n_events):
+    hist = np.asarray(hist, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    x = bin_centres(edges)
+    width = np.diff(edges)
+    if n_events is None:
+        n_events = hist.sum()
+    return hist, x, width, n_events
+
+def lnL_grid(hist, edges, taus, n_events=None):
+    """
+    Binned Poisson ln(L) = sum(h*ln(y) - y) for every tau in taus.
+
+    Empty bins only contribute -y, so 0*log(0) never turns a row into nan.
+    """
+    hist, x, width, n_events = _histogram_terms(hist, edges, n_events)
+    taus = np.asarray(taus, dtype=float)
+    filled = hist > 0
+    lnL = np.empty(len(taus))
+    for block, basis, log_basis in _basis_blocks(taus, x, len(hist), False, True):
+        #The basis of every bin is shared with other histograms, the empty ones are dropped after
+        lny = log_basis[:, filled] + np.log(n_events*width[filled])
+        lnL[block] = lny @ hist[filled] - basis @ (n_events*width)
+    return lnL
+
+def chi2_grid(hist, edges, taus, n_events=None):
+    """
+    Least squares chi^2 of ln(counts) against ln(y) for every tau in taus.
+
+    The error on ln(h) is sqrt(h)/h, so each filled bin is weighted by h and
+    empty bins are left out. As in the MATLAB fits ln(y) is clamped to 0
+    wherever the model predicts one count or fewer.
+    """
+    hist, x, width, n_events = _histogram_terms(hist, edges, n_events)
+    taus = np.asarray(taus, dtype=float)
+    filled = hist > 0
+    h = hist[filled]
+    lnbins = np.log(h)
+    chi2 = np.empty(len(taus))
+    for block, log_basis in _basis_blocks(taus, x, len(h), True):
+        y_ls = np.maximum(log_basis[:, filled] + np.log(n_events*width[filled]), 0)
+        chi2[block] = ((lnbins - y_ls)**2) @ h
+    return chi2
+
+def evenly_spaced(edges):
+    width = np.diff(np.asarray(edges, dtype=float))
+    return len(width) > 0 and np.allclose(width, width[0], rtol=1e-9, atol=0)
+
+def histogram_statistics(hist, edges, n_events=None):
+    """
+    Sufficient statistics of an evenly binned histogram for the exponential fits.
+
+    With bin centres x_i = x0 + i*d the Poisson ln(L) only needs sum(h) and
+    sum(h*x), and the LS X^2 only needs prefix sums of the h weighted moments
+    of x and ln(h). Once these are known both can be evaluated for any tau
+    without touching the bins again.
+    """
+    hist, x, width, n_events = _histogram_terms(hist, edges, n_events)
+    if not evenly_spaced(edges):
+        raise ValueError("histogram_statistics needs evenly spaced bin edges")
+    lnbins = np.log(np.where(hist > 0, hist, 1))
+    def prefix(values):
+        return np.concatenate(([0.], np.cumsum(values)))
+    return dict(
+        bins=len(hist), x0=x[0], d=width[0], A=n_events*width[0],
+        H=hist.sum(), S1=hist @ x,
+        W=prefix(hist), Wx=prefix(hist*x), Wxx=prefix(hist*x*x),
+        Wl=prefix(hist*lnbins), Wlx=prefix(hist*x*lnbins), Wll=prefix(hist*lnbins*lnbins),
+    )
+
+def batch_statistics(hists, edges):
+    """
+    histogram_statistics for a stack of histograms sharing the same edges,
+    one per row. Scalars become (rows, 1) columns and prefix sums (rows,
+    bins + 1) arrays, so the *_from_statistics functions take taus of shape
+    (rows, m) and return one row of values per histogram.
+    """
+    hists = np.atleast_2d(np.asarray(hists, dtype=float))
+    edges = np.asarray(edges, dtype=float)
+    if not evenly_spaced(edges):
+        raise ValueError("batch_statistics needs evenly spaced bin edges")
+    x = bin_centres(edges)
+    d = edges[1] - edges[0]
+    lnbins = np.log(np.where(hists > 0, hists, 1))
+    def prefix(values):
+        return np.concatenate((np.zeros((len(values), 1)), np.cumsum(values, axis=1)), axis=1)
+    H = hists.sum(axis=1, keepdims=True)
+    return dict(
+        bins=hists.shape[1], x0=x[0], d=d, A=H*d,
+        H=H, S1=(hists @ x)[:, None],
+        W=prefix(hists), Wx=prefix(hists*x), Wxx=prefix(hists*x*x),
+        Wl=prefix(hists*lnbins), Wlx=prefix(hists*x*lnbins), Wll=prefix(hists*lnbins*lnbins),
+    )
+
+def _prefix_at(stats, name, k):
+    #Prefix sum up to bin k, row by row for batch_statistics
+    values = stats[name]
+    if values.ndim == 1:
+        return values[k]
+    return np.take_along_axis(values, np.broadcast_to(k, (len(values),) + np.shape(k)[1:]), axis=1)
+
+def _geometric_total(stats, taus):
+    #sum of A/tau*exp(-x_i/tau) over all bins, summed as a geometric series
+    n, x0, d = stats['bins'], stats['x0'], stats['d']
+    return (stats['A']/taus)*np.exp(-x0/taus)*np.expm1(-n*d/taus)/np.expm1(-d/taus)
+
+def lnL_from_statistics(stats, taus):
+    """ln(L) for each tau in constant time per tau, see histogram_statistics."""
+    taus = np.asarray(taus, dtype=float)
+    return stats['H']*np.log(stats['A']/taus) - stats['S1']/taus - _geometric_total(stats, taus)
+
+def _unclamped_bins(stats, taus):
+    #ln(y_i) = c - x_i/tau is positive, and so left unclamped, for x_i < c*tau
+    c = np.log(stats['A']/taus)
+    k = np.ceil((c*taus - stats['x0'])/stats['d'])
+    return c, np.clip(k, 0, stats['bins']).astype(np.intp)
+
+def chi2_from_statistics(stats, taus):
+    """
+    X^2 for each tau in constant time per tau, see histogram_statistics.
+
+    Bins below the clamp point contribute h*(ln(h) - c + x/tau)^2, expanded
+    into the prefix moments, and the rest contribute h*ln(h)^2.
+    """
+    taus = np.asarray(taus, dtype=float)
+    c, k = _unclamped_bins(stats, taus)
+    b = 1/taus
+    W, Wx, Wxx, Wl, Wlx, Wll = [_prefix_at(stats, name, k) for name in ('W', 'Wx', 'Wxx', 'Wl', 'Wlx', 'Wll')]
+    inside = Wll + c*c*W - 2*c*Wl + 2*b*Wlx - 2*c*b*Wx + b*b*Wxx
+    outside = stats['Wll'][..., -1:] - Wll if stats['Wll'].ndim > 1 else stats['Wll'][-1] - Wll
+    return inside + outside
+
+def dlnL_from_statistics(stats, taus):
+    """Analytic d ln(L)/d tau, see lnL_from_statistics."""
+    taus = np.asarray(taus, dtype=float)
+    n, x0, d = stats['bins'], stats['x0'], stats['d']
+    total = _geometric_total(stats, taus)
+    #mean bin index of the model, sum(i*r**i)/sum(r**i) with r = exp(-d/tau)
+    r = np.exp(-d/taus)
+    mean_index = r/-np.expm1(-d/taus) - n*np.exp(-n*d/taus)/-np.expm1(-n*d/taus)
+    dtotal = total*(x0 + d*mean_index - taus)/taus**2
+    return -stats['H']/taus + stats['S1']/taus**2 - dtotal
+
+def brentq(f, a, b, xtol=1e-15, rtol=4*np.finfo(float).eps, maxiter=200):
+    """Root of f between a and b by Brent's method, f(a) and f(b) must differ in sign."""
+    fa, fb = f(a), f(b)
+    if fa == 0:
+        return a
+    if fb == 0:
+        return b
+    if np.sign(fa) == np.sign(fb):
+        raise ValueError("f(a) and f(b) must have opposite signs")
+    c, fc = a, fa
+    e = d = b - a
+    for i in range(0,maxiter):
+        if np.sign(fb) == np.sign(fc):
+            c, fc = a, fa
+            e = d = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = 2*rtol*abs(b) + xtol/2
+        m = (c - b)/2
+        if abs(m) <= tol or fb == 0:
+            return b
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            #Try inverse quadratic interpolation, falling back on the secant
+            s = fb/fa
+            if a == c:
+                p, q = 2*m*s, 1 - s
+            else:
+                q, r = fa/fc, fb/fc
+                p = s*(2*m*q*(q - r) - (b - a)*(r - 1))
+                q = (q - 1)*(r - 1)*(s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2*p < min(3*m*q - abs(tol*q), abs(e*q)):
+                e, d = d, p/q
+            else:
+                e = d = m
+        else:
+            e = d = m
+        a, fa = b, fb
+        b += d if abs(d) > tol else (tol if m > 0 else -tol)
+        fb = f(b)
+    return b
+
+GOLDEN = (np.sqrt(5) - 1)/2
+
+def golden_minimize(f, lo, hi, iterations=64):
+    """
+    Minimum of f between lo and hi by golden-section search, elementwise
+    when lo and hi are arrays. It only compares values of f, so it also
+    works where the derivative jumps; 64 steps shrink the bracket to 1e-13
+    of its width.
+    """
+    a, b = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+    c, d = b - GOLDEN*(b - a), a + GOLDEN*(b - a)
+    fc, fd = f(c), f(d)
+    for i in range(0,iterations):
+        #Keep [a, d] when c is lower, else [c, b], and reuse the inner point left over
+        left = fc < fd
+        a, b = np.where(left, a, c), np.where(left, d, b)
+        x = np.where(left, b - GOLDEN*(b - a), a + GOLDEN*(b - a))
+        fx = f(x)
+        c, d, fc, fd = (np.where(left, x, d), np.where(left, c, x),
+                        np.where(left, fx, fd), np.where(left, fc, fx))
+    return np.where(fc < fd, c, d)
+
+def _bisect(f, lo, hi, iterations=64):
+    #Elementwise bisection of f between lo and hi, where f changes sign
+    f_lo = f(lo)
+    for i in range(0,iterations):
+        mid = (lo + hi)/2
+        f_mid = f(mid)
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo, f_lo = np.where(left, mid, lo), np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+    return (lo + hi)/2
+
+def minimize_chi2(stats, lo, hi):
+    """
+    tau of the smallest X^2 between lo and hi, elementwise for the rows of
+    batch_statistics when lo and hi are arrays.
+
+    X^2 is smooth apart from a kink wherever a bin crosses the clamp, and
+    can have a local minimum on either side of one. The bracket is cut at
+    the kinks, the taus where (c*tau - x0)/d is a whole number, and the
+    lowest of the minima of the smooth pieces is kept.
+    """
+    lo, hi = np.asarray(lo, dtype=float)[..., None], np.asarray(hi, dtype=float)[..., None]
+    position = lambda taus: (np.log(stats['A']/taus)*taus - stats['x0'])/stats['d']
+    ends = np.concatenate([position(lo), position(hi)], axis=-1)
+    first, last = np.floor(ends.min(axis=-1, keepdims=True)) + 1, ends.max(axis=-1, keepdims=True)
+    pieces = max(int(np.max(np.ceil(last - first))) + 1, 1)
+    kinks = first + np.arange(pieces - 1)
+    inside = kinks < last
+    start, stop = np.broadcast_to(lo, kinks.shape), np.broadcast_to(hi, kinks.shape)
+    cuts = np.where(inside, _bisect(lambda taus: position(taus) - kinks, start, stop), stop)
+    bounds = np.concatenate([lo, np.sort(cuts, axis=-1), hi], axis=-1)
+    f = lambda taus: chi2_from_statistics(stats, taus)
+    taus = golden_minimize(f, bounds[..., :-1], bounds[..., 1:])
+    best = np.argmin(f(taus), axis=-1)[..., None]
+    return np.take_along_axis(taus, best, axis=-1)[..., 0]
+
+FIT_METHODS = {
+    #method: (objective, derivative or None for minimize_chi2, sign turning it into a minimisation, interval step)
+    'MLE': (lnL_from_statistics, dlnL_from_statistics, -1, 0.5),
+    'LS': (chi2_from_statistics, None, 1, 1.0),
+}
+
+def fit_tau(hist, edges, method='MLE', tau_range=(0.01, 100), n_events=None, grid=2001):
+    """
+    Best fit tau and its uncertainty for the 'MLE' or 'LS' method, see
+    fit_statistics.
+    """
+    return fit_statistics(histogram_statistics(hist, edges, n_events), method, tau_range, grid)
+
+def fit_statistics(stats, method='MLE', tau_range=(0.01, 100), grid=2001):
+    """
+    Best fit tau and its uncertainty from the statistics of a histogram.
+
+    A log spaced scan of the objective brackets the optimum between the
+    neighbours of the best grid point. Brent's method then finds the zero of
+    the analytic derivative of ln(L) to machine precision, while the clamped
+    X^2, whose derivative jumps, is minimised directly by minimize_chi2.
+    The errors are the crossings of ln(L) = max - 0.5 or X^2 = min + 1 on
+    either side. Returns a dict with tau, lower and upper errors, their mean
+    sigma and the objective value at tau; an error is nan when its crossing
+    lies outside tau_range.
+    """
+    if stats['H'] <= 0:
+        raise ValueError("cannot fit tau to an empty histogram")
+    objective, derivative, sign, step = FIT_METHODS[method]
+    f = lambda tau: sign*float(objective(stats, tau))
+
+    taus = np.geomspace(tau_range[0], tau_range[1], grid)
+    values = sign*objective(stats, taus)
+    best = int(np.argmin(values))
+    lo, hi = taus[max(best - 1, 0)], taus[min(best + 1, grid - 1)]
+    if derivative is None:
+        tau = float(minimize_chi2(stats, lo, hi))
+    else:
+        df = lambda tau: sign*float(derivative(stats, tau))
+        tau = brentq(df, lo, hi) if df(lo) < 0 < df(hi) else taus[best]
+    if f(tau) > values[best]:
+        tau = taus[best]
+    value = f(tau)
+
+    crossing = lambda t: f(t) - (value + step)
+    below = np.nonzero(values[:best] > value + step)[0]
+    above = np.nonzero(values[best + 1:] > value + step)[0]
+    lower = tau - brentq(crossing, taus[below[-1]], tau) if len(below) else np.nan
+    upper = brentq(crossing, tau, taus[best + 1 + above[0]]) - tau if len(above) else np.nan
+    return dict(method=method, tau=tau, lower=lower, upper=upper,
+                sigma=(lower + upper)/2, value=sign*value)
+
+def unbinned_statistics(decays, window=(0, 20)):
+    """
+    Number of decays inside window and the sum of their times measured from
+    its start, all the unbinned fit needs. decays are times in us, either an
+    array or an iterable of arrays that is read one chunk at a time, so a
+    file can be streamed through in constant memory, for example with
+    (times/1000 for times in data.iter_decay_times(path)).
+    """
+    if isinstance(decays, np.ndarray):
+        decays = (decays,)
+    start, stop = window
+    n_events, total = 0, 0.0
+    for chunk in decays:
+        chunk = np.asarray(chunk, dtype=float)
+        inside = chunk[(chunk >= start) & (chunk <= stop)]
+        n_events += len(inside)
+        total += float((inside - start).sum())
+    return dict(N=n_events, St=total, T=float(stop - start))
+
+def truncated_mean(taus, T):
+    """Mean of an exponential with lifetime tau cut off at T, tau - T/(exp(T/tau) - 1)."""
+    taus = np.asarray(taus, dtype=float)
+    with np.errstate(over='ignore'):
+        return taus - T/np.expm1(T/taus)
+
+def lnL_unbinned(stats, taus):
+    """Unbinned ln(L) of exponential decays truncated to the window, for each tau."""
+    taus = np.asarray(taus, dtype=float)
+    return -stats['N']*np.log(taus) - stats['St']/taus - stats['N']*np.log(-np.expm1(-stats['T']/taus))
+
+def fit_unbinned(stats, tau_range=(0.01, 100)):
+    """
+    Unbinned maximum likelihood tau from unbinned_statistics.
+
+    ln(L) is maximal where the truncated mean equals the mean decay time,
+    which Brent's method solves directly; the errors are the crossings of
+    ln(L) = max - 0.5, so they include the loss of information from the
+    truncation. Returns the same dict as fit_statistics.
+    """
+    if stats['N'] <= 0:
+        raise ValueError("cannot fit tau without decays in the window")
+    mean = stats['St']/stats['N']
+    score = lambda tau: mean - float(truncated_mean(tau, stats['T']))
+    lo, hi = tau_range
+    if not score(lo) > 0 > score(hi):
+        raise ValueError("mean decay time %.4g has no tau inside %s for a window of %.4g" % (mean, tau_range, stats['T']))
+    tau = brentq(score, lo, hi)
+    value = float(lnL_unbinned(stats, tau))
+
+    crossing = lambda t: float(lnL_unbinned(stats, t)) - (value - 0.5)
+    lower = tau - brentq(crossing, lo, tau) if crossing(lo) < 0 else np.nan
+    upper = brentq(crossing, tau, hi) - tau if crossing(hi) < 0 else np.nan
+    return dict(method='unbinned', tau=tau, lower=lower, upper=upper,
+                sigma=(lower + upper)/2, value=value)
+
+def background_curve(params, x, width):
+    """Expected counts per bin of N*exp(-t/tau)/tau + B, params being (N, tau, B)."""
+    n_events, tau, background = params
+    return width*(n_events/tau*np.exp(-np.asarray(x, dtype=float)/tau) + background)
+
+def _background_terms(params, hist, x, width):
+    #Poisson -ln(L) = sum(mu - h*ln(mu)), its gradient and Hessian in (N, tau, B)
+    n_events, tau, background = params
+    e = np.exp(-x/tau)
+    mu = width*(n_events/tau*e + background)
+    jac = np.stack([width*e/tau, width*n_events*e*(x - tau)/tau**3, width])
+    ratio = hist/mu
+    residual = 1 - ratio
+    grad = jac @ residual
+    hess = (jac*(hist/mu**2)) @ jac.T
+    #Only the tau rows of the second derivatives of mu are not zero
+    d_n_tau = width*e*(x - tau)/tau**3
+    d_tau_tau = width*n_events*e*(x*x - 4*x*tau + 2*tau*tau)/tau**5
+    hess[0, 1] += residual @ d_n_tau
+    hess[1, 0] = hess[0, 1]
+    hess[1, 1] += residual @ d_tau_tau
+    return np.sum(mu - hist*np.log(mu)), grad, hess
+
+def fit_background(hist, edges, start=None, tol=1e-10, max_iterations=100):
+    """
+    Poisson likelihood fit of N*exp(-t/tau)/tau + B to a histogram, where B is
+    a flat background of accidentals in counts per us.
+
+    Levenberg-Marquardt steps on the analytic gradient and Hessian, summed
+    over the bins as array operations, damped only when a full Newton step
+    would not lower -ln(L). B is kept at or above 0: a step past it is cut
+    back to B = 0, and B then stays there, with the step solved for N and tau
+    alone, as long as -ln(L) would still fall for negative B. start is
+    (N, tau, B), by default the histogram total, the MLE tau without
+    background and the level of the last tenth of the bins.
+
+    Returns a dict with tau and its sigma, N, B and their sigmas, the
+    covariance matrix of (N, tau, B) from the inverse Hessian, ln(L) at the
+    best fit, the number of iterations and whether the fit converged. A
+    singular Hessian, as from a single decay, stops the fit unconverged, and
+    gives nan sigmas and covariance where it cannot be inverted. A fit that
+    did not converge also raises a RuntimeWarning.
+    """
+    hist = np.asarray(hist, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    x = bin_centres(edges)
+    width = np.diff(edges)
+    if hist.sum() <= 0:
+        raise ValueError("cannot fit tau to an empty histogram")
+    if start is None:
+        tail = slice(len(hist) - max(len(hist)//10, 1), None)
+        background = hist[tail].sum()/width[tail].sum()
+        start = (hist.sum(), fit_tau(hist, edges, 'MLE')['tau'], background)
+    params = np.array(start, dtype=float)
+    params[2] = max(params[2], 0.0)
+    value, grad, hess = _background_terms(params, hist, x, width)
+    damping = 0.0
+    converged = False
+    for iteration in range(1, max_iterations + 1):
+        free = np.array([True, True, params[2] > 0 or grad[2] < 0])
+        step = np.zeros(3)
+        free_hess = hess[np.ix_(free, free)]
+        try:
+            step[free] = np.linalg.solve(free_hess + damping*np.diag(np.diag(free_hess)), -grad[free])
+        except np.linalg.LinAlgError:
+            #No damping helps where ln(L) is flat along some direction
+            break
+        trial = params + step
+        trial[2] = max(trial[2], 0.0)
+        step = trial - params
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trial_value = np.inf if trial[1] <= 0 else _background_terms(trial, hist, x, width)[0]
+        if np.isfinite(trial_value) and trial_value <= value:
+            converged = (abs(value - trial_value) < tol*max(abs(value), 1)
+                         and np.all(np.abs(step) <= np.sqrt(tol)*np.maximum(np.abs(trial), 1)))
+            params = trial
+            value, grad, hess = _background_terms(params, hist, x, width)
+            damping = damping/10 if damping > 1e-6 else 0.0
+            if converged:
+                break
+        else:
+            damping = max(10*damping, 1e-3)
+    try:
+        cov = np.linalg.inv(hess)
+    except np.linalg.LinAlgError:
+        cov = np.full((3, 3), np.nan)
+        converged = False
+    if not converged:
+        warnings.warn("fit_background did not converge in %d iterations" % iteration, RuntimeWarning)
+    sigmas = np.sqrt(np.diag(cov))
+    return dict(method='background', tau=params[1], sigma=sigmas[1], lower=sigmas[1], upper=sigmas[1],
+                N=params[0], N_sigma=sigmas[0], B=params[2], B_sigma=sigmas[2], cov=cov,
+                value=-value, iterations=iteration, converged=converged)
+
+def fit_batch(stats, method='MLE', tau_range=(0.01, 100), grid=2001):
+    """
+    fit_statistics for every row of batch_statistics in one vectorized pass.
+
+    The bracketing scan on the same grid as fit_statistics is shared by all
+    rows, the zero of the derivative of ln(L) and the interval crossings are
+    then found by elementwise bisection, which reaches machine precision in
+    64 steps, and X^2 is minimised by minimize_chi2 as in fit_statistics.
+    Returns a dict of arrays with one entry per row, all nan for an empty
+    histogram.
+    """
+    filled = stats['H'].ravel() > 0
+    result = dict(method=method)
+    for key in ('tau', 'lower', 'upper', 'sigma', 'value'):
+        result[key] = np.full(len(filled), np.nan)
+    if filled.any():
+        rows = dict((name, values[filled] if np.ndim(values) else values) for name, values in stats.items())
+        for key, values in _fit_rows(rows, method, tau_range, grid).items():
+            result[key][filled] = values
+    return result
+
+def _fit_rows(stats, method, tau_range, grid):
+    #fit_batch of histograms that are all filled
+    objective, derivative, sign, step = FIT_METHODS[method]
+    rows = stats['H'].shape[0]
+    column = lambda values: np.asarray(values, dtype=float).reshape(rows, 1)
+    f = lambda taus: sign*objective(stats, column(taus)).ravel()
+
+    taus = np.geomspace(tau_range[0], tau_range[1], grid)
+    values = sign*objective(stats, np.broadcast_to(taus, (rows, grid)))
+    best = np.argmin(values, axis=1)
+    lo, hi = taus[np.maximum(best - 1, 0)], taus[np.minimum(best + 1, grid - 1)]
+    if derivative is None:
+        tau = minimize_chi2(stats, lo, hi)
+    else:
+        df = lambda taus: sign*derivative(stats, column(taus)).ravel()
+        bracketed = (df(lo) < 0) & (df(hi) > 0)
+        tau = np.where(bracketed, _bisect(df, lo, hi), taus[best])
+    tau = np.where(f(tau) > values[np.arange(rows), best], taus[best], tau)
+    value = f(tau)
+
+    crossing = lambda t: f(t) - (value + step)
+    index = np.arange(grid)
+    out = values > (value + step)[:, None]
+    below = np.where(out & (index < best[:, None]), index, -1).max(axis=1)
+    above = np.where(out & (index > best[:, None]), index, grid).min(axis=1)
+    lower = tau - _bisect(crossing, taus[np.maximum(below, 0)], tau)
+    upper = _bisect(crossing, tau, taus[np.minimum(above, grid - 1)]) - tau
+    lower[below < 0] = np.nan
+    upper[above >= grid] = np.nan
+    return dict(tau=tau, lower=lower, upper=upper, sigma=(lower + upper)/2, value=sign*value)
+
+def likelihood_scan(hist, edges, taus, n_events=None):
+    """Model curves, ln(L) and chi^2 for a whole tau grid in one call."""
+    hist, x, width, n_events = _histogram_terms(hist, edges, n_events)
+    y = model_curves(taus, x, n_events, width, cache=True)
+    if evenly_spaced(edges):
+        stats = histogram_statistics(hist, edges, n_events)
+        return x, y, lnL_from_statistics(stats, taus), chi2_from_statistics(stats, taus)
+    lnL = lnL_grid(hist, edges, taus, n_events)
+    chi2s = chi2_grid(hist, edges, taus, n_events)
+    return x, y, lnL, chi2s
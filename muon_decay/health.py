@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Detector health from every line of a run, decays and "no decay" records.
+
+Each line is a muon through the detector, so the line rate is the muon
+rate, missing seconds and long gaps in the timestamps are dead time, and
+the offsets of the "no decay" records above 40000 ns show the timing
+jitter. DetectorHealth is updated with each chunk as data.load_decays
+parses it, so the statistics cost no second read of the file. Its memory
+is a counter per SENTINEL_BINS offsets and per bin_seconds of run, however
+many lines there are; timestamps more than MAX_SPAN from the start of the
+run are corrupt lines and only counted, so one of them cannot stretch the
+run.
+"""
+import numpy as np
+
+#Offsets of the "no decay" records counted one by one, larger ones go in the last
+SENTINEL_BINS = 64
+#Offsets above 40000 ns that mark timing jitter
+JITTER_OFFSETS = (2, 9)
+#Gaps of at least this many missing seconds are dead periods
+DEAD_SECONDS = 60
+#Dead periods listed one by one, the rest are only counted
+MAX_GAPS = 1000
+#Timestamps further than this from the first one of the run are outliers
+MAX_SPAN = 366*86400
+
+class DetectorHealth:
+    """
+    Running line and decay rates per bin_seconds, timestamp gaps and the
+    distribution of "no decay" offsets of a run read in file order.
+    """
+    def __init__(self, bin_seconds=60, dead_seconds=DEAD_SECONDS):
+        self.bin_seconds = bin_seconds
+        self.dead_seconds = dead_seconds
+        self.lines = self.decays = self.bad_lines = 0
+        self.first = self.last = self.origin = None
+        self.live_seconds = self.missing_seconds = self.backwards = self.outliers = 0
+        self.dead_periods = self.dead_time = 0
+        self.gaps = []
+        self.offsets = np.zeros(SENTINEL_BINS, dtype=np.int64)
+        self.line_counts = np.zeros(0, dtype=np.int64)
+        self.decay_counts = np.zeros(0, dtype=np.int64)
+
+    def _add_counts(self, counts, stamps, monotonic):
+        if not len(stamps):
+            return counts
+        if monotonic:
+            #Sorted stamps are counted per bin from where the bin edges fall among them
+            first = max(int(stamps[0]) - self.origin, 0)//self.bin_seconds
+            last = max(int(stamps[-1]) - self.origin, 0)//self.bin_seconds
+            edges = self.origin + np.arange(first + 1, last + 1, dtype=np.int64)*self.bin_seconds
+            bounds = np.concatenate([[0], np.searchsorted(stamps, edges), [len(stamps)]])
+            new = np.zeros(last + 1, dtype=np.int64)
+            new[first:] = np.diff(bounds)
+        else:
+            new = np.bincount(np.maximum(stamps - self.origin, 0)//self.bin_seconds)
+        if len(new) > len(counts):
+            counts = np.concatenate([counts, np.zeros(len(new) - len(counts), dtype=np.int64)])
+        counts[:len(new)] += new
+        return counts
+
+    def update(self, stamps, offsets, bad=0):
+        """
+        Add a chunk of lines: their timestamps, the offsets of their times
+        above 40000 ns, negative for decays, and the number of malformed
+        lines the parser skipped in it. Lines stamped more than MAX_SPAN
+        from the first of the run, or from the median of the first chunk
+        before there is one, count as lines but not towards the times.
+        """
+        self.bad_lines += bad
+        if not len(stamps):
+            return
+        stamps = np.asarray(stamps, dtype=np.int64)
+        decay = offsets < 0
+        self.lines += len(stamps)
+        self.decays += int(np.count_nonzero(decay))
+        #Decays land in the first count, which is dropped
+        self.offsets += np.bincount(np.clip(offsets + 1, 0, SENTINEL_BINS), minlength=SENTINEL_BINS + 1)[1:]
+
+        anchor = self.first if self.first is not None else int(np.median(stamps))
+        inside = np.abs(stamps - anchor) <= MAX_SPAN
+        if not inside.all():
+            self.outliers += len(stamps) - int(np.count_nonzero(inside))
+            stamps, decay = stamps[inside], decay[inside]
+            if not len(stamps):
+                return
+        if self.first is None:
+            self.first = int(stamps[0])
+            self.origin = self.first - self.first % self.bin_seconds
+            self.live_seconds = 1
+            previous = stamps[0]
+        else:
+            previous = self.last
+
+        #Steps from each line to the next, the one from the last chunk included
+        steps = np.diff(stamps, prepend=previous)
+        monotonic = previous <= stamps[0] and not (steps < 0).any()
+        if monotonic:
+            forward = np.count_nonzero(steps)
+            missing = int(stamps[-1] - previous) - forward
+        else:
+            self.backwards += int(np.count_nonzero(steps < 0))
+            forward = np.count_nonzero(steps > 0)
+            missing = int((steps[steps > 1] - 1).sum())
+        self.live_seconds += int(forward)
+        self.missing_seconds += missing
+        dead = np.flatnonzero(steps > self.dead_seconds)
+        self.dead_periods += len(dead)
+        self.dead_time += int((steps[dead] - 1).sum())
+        for i in dead[:max(MAX_GAPS - len(self.gaps), 0)]:
+            self.gaps.append((int(stamps[i] - steps[i] + 1), int(steps[i] - 1)))
+        self.last = int(stamps[-1])
+
+        self.line_counts = self._add_counts(self.line_counts, stamps, monotonic)
+        self.decay_counts = self._add_counts(self.decay_counts, stamps[decay], monotonic)
+
+    def summary(self, series=True):
+        """
+        The statistics as a JSON-ready dict; rates are per second of live
+        time and series adds the line and decay counts of every
+        bin_seconds from origin on.
+        """
+        records = self.lines - self.decays
+        live = max(self.live_seconds, 1)
+        jitter = self.offsets[JITTER_OFFSETS[0]:JITTER_OFFSETS[1] + 1].sum()
+        result = dict(lines=self.lines, decays=self.decays, records=records, bad_lines=self.bad_lines,
+                      first=self.first, last=self.last,
+                      duration=(self.last - self.first + 1) if self.first is not None else 0,
+                      live_seconds=self.live_seconds, missing_seconds=self.missing_seconds,
+                      backwards=self.backwards, outliers=self.outliers, dead_seconds=self.dead_seconds, dead_periods=self.dead_periods,
+                      dead_time=self.dead_time,
+                      gaps=[list(gap) for gap in self.gaps], muon_rate=self.lines/live, decay_rate=self.decays/live,
+                      offsets=self.offsets.tolist(),
+                      mean_offset=float((self.offsets*np.arange(SENTINEL_BINS)).sum()/records) if records else None,
+                      jitter_fraction=float(jitter/records) if records else None)
+        if len(self.line_counts):
+            per_second = self.line_counts/self.bin_seconds
+            result.update(min_muon_rate=float(per_second.min()), max_muon_rate=float(per_second.max()))
+        if series:
+            result.update(bin_seconds=self.bin_seconds, origin=self.origin, line_counts=self.line_counts.tolist(),
+                          decay_counts=np.pad(self.decay_counts, (0, len(self.line_counts) - len(self.decay_counts))).tolist())
+        return result
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Stage timers, counters and optional profiling, written as a JSON log.
+
+Each line of the log is one JSON object with an "event" and the seconds "t"
+since the run started: a "stage" record with its duration when a stage
+ends, with the type of the exception when it raised, a "warning" record for
+every warning raised inside a stage, and a final "summary" with the totals
+per stage and every counter.
+
+Profiling is off unless asked for, with --profile and --trace-memory on
+the command line or MUON_PROFILE=cprofile,tracemalloc in the environment.
+cProfile statistics are dumped next to the log as <log>.prof and the top
+functions added to the summary, tracemalloc adds the peak traced memory to
+every stage record.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+import warnings
+from contextlib import contextmanager
+
+PROFILE_ENV = 'MUON_PROFILE'
+LOG_ENV = 'MUON_LOG'
+#Functions by cumulative time listed in the summary when profiling
+PROFILE_TOP = 20
+
+def _jsonable(value):
+    #NumPy arrays and scalars go in the log as lists and numbers, anything else as its str
+    return value.tolist() if hasattr(value, 'tolist') else str(value)
+
+class Instruments:
+    """Timers and counters of one run, see the module docstring for the log format."""
+
+    def __init__(self, log_path='py.log', profile=False, trace_memory=False):
+        self.log_path = log_path
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.warnings = 0
+        self._log = open(log_path, 'w') if log_path else None
+        self._profiler = cProfile.Profile() if profile else None
+        self._trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self._profiler is not None:
+            self._profiler.enable()
+        self.log('start', argv=sys.argv, pid=os.getpid(), profile=profile, trace_memory=trace_memory)
+
+    def log(self, event, **fields):
+        if self._log is None:
+            return
+        record = dict(event=event, t=round(time.perf_counter() - self.start, 6))
+        record.update(fields)
+        self._log.write(json.dumps(record, default=_jsonable) + "\n")
+        self._log.flush()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the block as stage name, adding to earlier runs of the same
+        stage. Warnings raised inside are logged and then shown as usual,
+        and a block that raises is still logged, with the exception type.
+        """
+        if self._trace_memory:
+            tracemalloc.reset_peak()
+        caught = []
+        error = None
+        start = time.perf_counter()
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                yield self
+        except BaseException as exception:
+            error = exception
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            total = self.stages.setdefault(name, dict(calls=0, seconds=0.0))
+            total['calls'] += 1
+            total['seconds'] += seconds
+            record = dict(stage=name, seconds=round(seconds, 6))
+            if self._trace_memory:
+                record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                total['peak_bytes'] = max(total.get('peak_bytes', 0), record['peak_bytes'])
+            if error is not None:
+                record['error'] = type(error).__name__
+            for warning in caught:
+                self.warnings += 1
+                self.log('warning', stage=name, category=warning.category.__name__, message=str(warning.message),
+                         file=warning.filename, line=warning.lineno)
+                warnings.showwarning(warning.message, warning.category, warning.filename, warning.lineno)
+            self.log('stage', **record)
+
+    def summary(self):
+        return dict(seconds=time.perf_counter() - self.start, stages=self.stages, counters=self.counters,
+                    warnings=self.warnings)
+
+    def close(self):
+        summary = self.summary()
+        if self._profiler is not None:
+            self._profiler.disable()
+            if self.log_path:
+                self._profiler.dump_stats(self.log_path + '.prof')
+            summary['profile'] = top_functions(self._profiler)
+        self.log('summary', **summary)
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        return summary
+
+def top_functions(profiler, n=PROFILE_TOP):
+    """The n functions with the most cumulative time as dicts."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    stats.sort_stats('cumulative')
+    rows = []
+    for function in stats.fcn_list[:n]:
+        calls, primitive, own, cumulative, callers = stats.stats[function]
+        rows.append(dict(function='%s:%d(%s)' % function, calls=calls, own_seconds=own, cumulative_seconds=cumulative))
+    return rows
+
+def add_arguments(parser):
+    """The --profile, --trace-memory and --log options of from_arguments."""
+    parser.add_argument('--profile', action='store_true', help="profile the run with cProfile")
+    parser.add_argument('--trace-memory', action='store_true', help="peak traced memory of every stage")
+    parser.add_argument('--log', help="JSON log file, py.log by default")
+
+def from_arguments(args, log_path='py.log'):
+    """
+    Instruments configured by the options of add_arguments, falling back on
+    MUON_PROFILE and MUON_LOG.
+    """
+    wanted = [item.strip() for item in os.environ.get(PROFILE_ENV, '').lower().split(',')]
+    return Instruments(args.log or os.environ.get(LOG_ENV, log_path),
+                       profile=args.profile or 'cprofile' in wanted,
+                       trace_memory=args.trace_memory or 'tracemalloc' in wanted)
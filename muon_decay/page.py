@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Mar 11 15:39:13 2021
+
+@author: Loïc James McKeever
+
+The Muon Decay page with the fits done in Python: the browser is sent the
+histogram statistics, or the precomputed tau grid, and only looks values up.
+"""
+import numpy as np
+
+from bokeh.layouts import column
+from bokeh.models import CustomJS, Slider, HoverTool, Label, Button
+from bokeh.plotting import figure, ColumnDataSource
+
+from .fit import (bin_centres, chi2_from_statistics, fit_background, fit_tau, fit_unbinned, histogram_statistics,
+                  lnL_from_statistics, model_curves, unbinned_statistics)
+from .decimate import MAX_POINTS, subsample
+from .instrument import Instruments
+from .plots import HISTORY_JS, add_fit_curve, background_fit_controls, histogram_glyphs
+
+#Width of the introduction text on the page
+PAGE_WIDTH = 1900
+#Send the page the histogram statistics instead of every precomputed curve
+COMPACT_OUTPUT = True
+
+#JS giving the curve, ln(L) and X^2 at tau t from the precomputed tau grid
+GRID_JS = """
+        const grid = source.data;
+        const grid_index = (t) => Math.round(t*100) - 1;
+        const curve_at = (t) => grid['y'][grid_index(t)];
+        const lnL_at = (t) => grid['lnL'][grid_index(t)];
+        const chi2_at = (t) => grid['chi2s'][grid_index(t)];
+"""
+
+#The same from the histogram statistics of fit.histogram_statistics
+STATS_JS = """
+        const s = source.data;
+        const p = params;
+        function curve_at(t) {
+                return x.map(xi => p.A/t*Math.exp(-xi/t));
+        }
+        function lnL_at(t) {
+                const total = (p.A/t)*Math.exp(-p.x0/t)*Math.expm1(-p.bins*p.d/t)/Math.expm1(-p.d/t);
+                return p.H*Math.log(p.A/t) - p.S1/t - total;
+        }
+        function chi2_at(t) {
+                const c = Math.log(p.A/t);
+                const b = 1/t;
+                const k = Math.min(Math.max(Math.ceil((c*t - p.x0)/p.d), 0), p.bins);
+                const inside = s.Wll[k] + c*c*s.W[k] - 2*c*s.Wl[k] + 2*b*s.Wlx[k] - 2*c*b*s.Wx[k] + b*b*s.Wxx[k];
+                return inside + s.Wll[p.bins] - s.Wll[k];
+        }
+"""
+
+def fit_label_text(name, fit):
+    return '%s = %.2f at tau = %.4f +%.4f/-%.4f' % (name, fit['value'], fit['tau'], fit['upper'], fit['lower'])
+
+def MLE_LS_curve_fitting(hist, edges, bins, compact=COMPACT_OUTPUT, decays=None, instruments=None,
+                         max_points=MAX_POINTS, log_y=False):
+    instruments = instruments or Instruments(log_path=None)
+
+    plot = figure(title="Number of Muon Decays in relation to decay time",width=1500,height=800,
+                  y_axis_type='log' if log_y else 'linear')
+    #Counts and their errors, at most max_points buckets whatever the binning
+    histogram_glyphs(plot, hist, edges, max_points, log_y=log_y)
+    plot.xaxis.axis_label = "Time in microseconds"
+    plot.yaxis.axis_label = "Number of decays"
+
+    #Create the MLE curvefit based on tau including the slider and the value of ln(L)
+    #x is the time, each value is the center of the edges of the bins of the histogram
+    #create the tau slider
+    tau_slider = Slider(start=0.01, end=5, value=2.5, step=.01, title="Tau")
+    slider_values = np.arange(0.01, 5.01, .01)
+    with instruments.stage('model grid'):
+        stats = histogram_statistics(hist, edges)
+        #The curves are smooth, so max_points of their points are drawn for any binning
+        x = bin_centres(edges)[subsample(len(hist), max_points)]
+        #The compact page only needs the curve at the starting tau
+        y = model_curves([2.5] if compact else slider_values, x, stats['H'], stats['d'], cache=not compact)
+    instruments.count('bins', len(hist))
+    instruments.count('model curves', len(y))
+    with instruments.stage('ln(L)'):
+        lnL = lnL_from_statistics(stats, slider_values)
+        mle_fit = fit_tau(hist, edges, 'MLE')
+    with instruments.stage('X^2'):
+        chi2s = chi2_from_statistics(stats, slider_values)
+        ls_fit = fit_tau(hist, edges, 'LS')
+    #Best fit tau and its uncertainty are found in Python so the page only has to show them
+    if compact:
+        #The page rebuilds the curve, ln(L) and X^2 for any tau from a handful of
+        #histogram statistics, so nothing sent to it grows with the tau grid
+        y_start = y[0]
+        lnL_start, chi2_start = float(lnL[249]), float(chi2s[249])
+        source = ColumnDataSource(data=dict((name, stats[name]) for name in ('W', 'Wx', 'Wxx', 'Wl', 'Wlx', 'Wll')))
+        source_ls = source
+        params = dict((name, float(stats[name])) for name in ('bins', 'x0', 'd', 'A', 'H', 'S1'))
+        lookup_js = STATS_JS
+    else:
+        #y is our MLE curve fit for each value of tau of our slider, lnL and chi2s the
+        #matching ln(L) and X^2, all computed as whole-grid array operations
+        y_start, lnL_start, chi2_start = y[249], lnL[249], chi2s[249]
+        #need a list of 500 of them for the lists being sent to ColumnDataSource to match
+        x_datasource = [x for i in range(0,500)]
+        source = ColumnDataSource(data=dict(x=x_datasource,y=list(y), lnL=lnL))
+        source_ls = ColumnDataSource(data=dict(x=x_datasource,y=list(y),chi2s=chi2s))
+        params = {}
+        lookup_js = GRID_JS
+
+    #Prepare the data for use with JS in the HTML file
+    plot_source = ColumnDataSource(data=dict(x=x,y=y_start))
+
+    lnL_source = ColumnDataSource(data=dict(x=[2.5],y=[lnL_start],color=['#ff0000'],size=[10]))
+    lnL_plot = figure(title="Ln(L) in relation to tau", width=400, height=400)
+    lnL_plot.scatter('x','y',color='color', size='size', source=lnL_source)
+    lnL_plot.xaxis.axis_label = "Value of tau"
+    #lnL_plot.x_range = Range1d(0, 5)
+    lnL_plot.yaxis.axis_label = "Value of ln(L)"
+    #lnL_plot.y_range = Range1d(0, 1000)
+
+    lnL_hovertool = HoverTool(tooltips=[("ln(L)","@y"),("tau","@x")])
+    lnL_plot.tools.append(lnL_hovertool)
+
+    plot.line('x','y', source=plot_source, line_width=2, line_color='#ff0000', legend_label='MLE')
+    #The unbinned fit needs the decay times themselves, not just the histogram
+    if decays is not None:
+        with instruments.stage('unbinned'):
+            unbinned_fit = fit_unbinned(unbinned_statistics(decays, (edges[0], edges[-1])))
+        add_fit_curve(plot, edges, hist.sum(), unbinned_fit)
+
+    lnL_label = Label(x=70, y=70, x_units='screen', y_units='screen',
+                 text='ln(L) = ' + str(round(lnL_start, 2)), render_mode='css',
+                 border_line_color='black', border_line_alpha=1.0,
+                 background_fill_color='white', background_fill_alpha=1.0)
+
+    #JavaScript to control plot based on slider action
+    callback = CustomJS(args=dict(source=source, params=params, plot_source=plot_source, lnL_source=lnL_source, tau=tau_slider, lnL_label=lnL_label), code = HISTORY_JS + """
+        const t = tau.value;
+
+        const plot_data = plot_source.data
+        const x = plot_data['x']
+""" + lookup_js + """
+
+        var lnL = lnL_at(t)
+        plot_data['y'] = curve_at(t)
+
+        lnL_label.text = 'ln(L) = ' + lnL.toFixed(2);
+
+        record_point(lnL_source, t, lnL, (a, b) => a > b);
+
+        plot_source.change.emit();
+    """)
+
+    tau_slider.js_on_change('value',callback)
+
+    button = Button(label="Maximize ln(L)", button_type="success")
+    button.js_on_click(CustomJS(args=dict(tau=tau_slider, lnL_label=lnL_label, tau_hat=round(mle_fit['tau'], 2),
+                                          fit_text=fit_label_text('ln(L)', mle_fit)), code="""
+        tau.value = tau_hat;
+        lnL_label.text = fit_text;
+    """))
+
+    lnL_plot.add_layout(lnL_label)
+
+    #Create the LS curve fit, X^2 for each value of tau comes from the same source as ln(L)
+    plot_source_ls = ColumnDataSource(data=dict(x=x,y=y_start))
+
+    chi2_source = ColumnDataSource(data=dict(x=[2.5],y=[chi2_start],color=['#ff0000'],size=[10]))
+    chi2_plot = figure(title="X^2 in relation to tau", width=400, height=400)
+    chi2_plot.scatter('x','y',color='color', size='size', source=chi2_source)
+    chi2_plot.xaxis.axis_label = "Value of tau"
+    chi2_plot.yaxis.axis_label = "Value of X^2"
+
+    chi2_hovertool = HoverTool(tooltips=[("X^2","@y"),("tau","@x")])
+    chi2_plot.tools.append(chi2_hovertool)
+
+    plot.line('x','y', source=plot_source_ls, line_width=2, line_color='#ffa500', legend_label='LS')
+
+    tau_slider_ls = Slider(start=0.01, end=5, value=2.5, step=.01, title="Tau")
+
+    chi2_label = Label(x=70, y=70, x_units='screen', y_units='screen',
+                 text='X^2 = ' + str(round(chi2_start, 2)), render_mode='css',
+                 border_line_color='black', border_line_alpha=1.0,
+                 background_fill_color='white', background_fill_alpha=1.0)
+
+    callback_ls = CustomJS(args=dict(source=source_ls, params=params, plot_source=plot_source_ls, chi2_source=chi2_source, tau=tau_slider_ls, chi2_label=chi2_label), code = HISTORY_JS + """
+        const t = tau.value;
+
+        const plot_data = plot_source.data
+        const x = plot_data['x']
+""" + lookup_js + """
+
+        var chi2 = chi2_at(t)
+        plot_data['y'] = curve_at(t)
+
+        chi2_label.text = 'X^2 = ' + chi2.toFixed(2);
+
+        record_point(chi2_source, t, chi2, (a, b) => a < b);
+        plot_source.change.emit();
+    """)
+
+    tau_slider_ls.js_on_change('value',callback_ls)
+
+    chi2_button = Button(label="Minimize X^2", button_type="success")
+    chi2_button.js_on_click(CustomJS(args=dict(tau=tau_slider_ls, chi2_label=chi2_label, tau_hat=round(ls_fit['tau'], 2),
+                                               fit_text=fit_label_text('X^2', ls_fit)), code="""
+        tau.value = tau_hat;
+        chi2_label.text = fit_text;
+    """))
+
+    chi2_plot.add_layout(chi2_label)
+
+    #Legend location and interaction option
+    plot.legend.location = "top_right"
+    plot.legend.click_policy = "hide"
+
+    #Poisson fit of N*exp(-t/tau)/tau + B, shown on demand
+    with instruments.stage('background'):
+        background_fit = fit_background(hist, edges)
+    instruments.count('background iterations', background_fit['iterations'])
+    background_button = background_fit_controls(plot, edges, background_fit)
+
+    return plot, tau_slider, lnL_plot, button, tau_slider_ls, chi2_plot, chi2_button, background_button
+
+def fitting_panel(hist, edges, decays=None, compact=COMPACT_OUTPUT, instruments=None, max_points=MAX_POINTS,
+                  log_y=False):
+    """The histogram plot with the fit controls beside it, as laid out on the page."""
+    plot, tau_slider, lnL_plot, button, tau_slider_ls, chi2_plot, chi2_button, background_button = MLE_LS_curve_fitting(
+        hist, edges, len(hist), compact, decays, instruments, max_points, log_y)
+    return plot, column(tau_slider, lnL_plot, button, tau_slider_ls, chi2_plot, chi2_button, background_button)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Mar 11 15:39:13 2021
+
+@author: Loïc James McKeever
+
+The Muon Decay page that recomputes the curve, ln(L) and X^2 in the browser
+from the histogram each time a slider moves.
+"""
+import numpy as np
+
+from bokeh.layouts import column
+from bokeh.models import CustomJS, Slider, HoverTool, Label, Button
+from bokeh.plotting import figure, ColumnDataSource
+
+from .fit import bin_centres, fit_background, fit_tau, fit_unbinned, unbinned_statistics
+from .decimate import MAX_POINTS, subsample
+from .instrument import Instruments
+from .page import fit_label_text
+from .plots import HISTORY_JS, add_fit_curve, background_fit_controls, histogram_glyphs
+
+#Width of the introduction text on the page
+PAGE_WIDTH = 1500
+
+def MLE_LS_curve_fitting(hist, edges, decays=None, max_points=MAX_POINTS, log_y=False, instruments=None):
+    instruments = instruments or Instruments(log_path=None)
+    hist = np.asarray(hist)
+    #The counts travel once, as a 32 bit binary array, for the callbacks and the zoom alike
+    counts = ColumnDataSource(data=dict(h=hist.astype(np.int32)))
+
+    plot = figure(title="Number of Muon Decays in relation to decay time",width=1500,height=800,
+                  y_axis_type='log' if log_y else 'linear')
+    #Counts and their errors, at most max_points buckets whatever the binning
+    histogram_glyphs(plot, hist, edges, max_points, counts, log_y)
+    plot.xaxis.axis_label = "Time in microseconds"
+    plot.yaxis.axis_label = "Number of decays"
+
+    #Create the MLE curvefit based on tau including the slider and the value of ln(L)
+    #scale is the number of decays times the bin width, so any binning gives counts per bin
+    scale = float(hist.sum()*(edges[1] - edges[0]))
+    x = bin_centres(edges)
+    x0, d = float(x[0]), float(edges[1] - edges[0])
+    y = (scale/2.5)*np.exp(-x/2.5)
+
+    lnL = float(np.sum(hist*np.log(y) - y))
+    #Best fit tau and its uncertainty, found in Python so the page only has to show it
+    with instruments.stage('ln(L)'):
+        mle_fit = fit_tau(hist, edges, 'MLE')
+    with instruments.stage('X^2'):
+        ls_fit = fit_tau(hist, edges, 'LS')
+
+    #The curves are smooth, so max_points of their points are drawn for any binning
+    kept = subsample(len(hist), max_points)
+    source = ColumnDataSource(data=dict(x=x[kept],y=y[kept]))
+
+    lnL_source = ColumnDataSource(data=dict(x=[2.5],y=[lnL],color=['#ff0000'],size=[10]))
+    lnL_plot = figure(title="Ln(L) in relation to tau", width=400, height=400)
+    lnL_plot.scatter('x','y',color='color', size='size', source=lnL_source)
+    lnL_plot.xaxis.axis_label = "Value of tau"
+    lnL_plot.yaxis.axis_label = "Value of ln(L)"
+
+    lnL_hovertool = HoverTool(tooltips=[("ln(L)","@y"),("tau","@x")])
+    lnL_plot.tools.append(lnL_hovertool)
+
+    plot.line('x','y', source=source, line_width=2, line_color='#ff0000', legend_label='MLE')
+    #The unbinned fit needs the decay times themselves, not just the histogram
+    if decays is not None:
+        with instruments.stage('unbinned'):
+            unbinned_fit = fit_unbinned(unbinned_statistics(decays, (edges[0], edges[-1])))
+        add_fit_curve(plot, edges, hist.sum(), unbinned_fit)
+
+    lnL_label = Label(x=70, y=70, x_units='screen', y_units='screen',
+                 text='ln(L) = ' + str(round(lnL, 2)), render_mode='css',
+                 border_line_color='black', border_line_alpha=1.0,
+                 background_fill_color='white', background_fill_alpha=1.0)
+
+    tau_slider = Slider(start=0.01, end=5, value=2.5, step=.01, title="Tau")
+
+    callback = CustomJS(args=dict(source=source, counts=counts, x0=x0, d=d, scale=scale, lnL_source=lnL_source, tau=tau_slider, lnL_label=lnL_label), code = HISTORY_JS + """
+        const data = source.data;
+        const t = tau.value;
+        const x = data['x'];
+        const y = data['y'];
+        const hist = counts.data['h'];
+
+        var lnL = 0;
+
+        for (var i = 0; i < x.length; i++){
+                y[i] = scale/t * Math.exp((-x[i])/t);
+        }
+
+        //Every bin counts in ln(L), at its centre x0 + i*d, with ln(y) written out
+        const c = Math.log(scale/t);
+        for (var i = 0; i < hist.length; i++){
+                const xi = x0 + i*d;
+                lnL += hist[i] * (c - xi/t) - Math.exp(c - xi/t);
+        }
+
+        lnL_label.text = 'ln(L) = ' + lnL.toFixed(2);
+
+        record_point(lnL_source, t, lnL, (a, b) => a > b);
+
+        source.change.emit();
+    """)
+
+    tau_slider.js_on_change('value',callback)
+
+    button = Button(label="Maximize ln(L)", button_type="success")
+    button.js_on_click(CustomJS(args=dict(tau=tau_slider, lnL_label=lnL_label, tau_hat=round(mle_fit['tau'], 2),
+                                          fit_text=fit_label_text('ln(L)', mle_fit)), code="""
+        tau.value = tau_hat;
+        lnL_label.text = fit_text;
+    """))
+
+    lnL_plot.add_layout(lnL_label)
+
+    #Create the LS curve fit
+    filled = hist > 0
+    lnbins = np.where(filled, np.log(np.where(filled, hist, 1)), 0)
+    #ln(y) is clamped at 0 where y <= 1, as in fit.chi2_from_statistics, so the button and the scan agree
+    y_ls = np.log(np.maximum(y, 1))
+
+    #Relative error squared of a filled bin is 1/count, empty bins add nothing
+    chi2 = float(np.sum(np.where(filled, (lnbins - y_ls)**2*hist, 0)))
+
+    source_ls = ColumnDataSource(data=dict(x=x[kept],y=y[kept]))
+
+    chi2_source = ColumnDataSource(data=dict(x=[2.5],y=[chi2],color=['#ff0000'],size=[10]))
+    chi2_plot = figure(title="X^2 in relation to tau", width=400, height=400)
+    chi2_plot.scatter('x','y',color='color', size='size', source=chi2_source)
+    chi2_plot.xaxis.axis_label = "Value of tau"
+    chi2_plot.yaxis.axis_label = "Value of X^2"
+
+    chi2_hovertool = HoverTool(tooltips=[("X^2","@y"),("tau","@x")])
+    chi2_plot.tools.append(chi2_hovertool)
+
+    plot.line('x','y', source=source_ls, line_width=2, line_color='#ffa500', legend_label='LS')
+
+    tau_slider_ls = Slider(start=0.01, end=5, value=2.5, step=.001, title="Tau")
+
+    chi2_label = Label(x=70, y=70, x_units='screen', y_units='screen',
+                 text='X^2 = ' + str(round(chi2, 2)), render_mode='css',
+                 border_line_color='black', border_line_alpha=1.0,
+                 background_fill_color='white', background_fill_alpha=1.0)
+
+    callback_ls = CustomJS(args=dict(source=source_ls, counts=counts, x0=x0, d=d, scale=scale, chi2_source=chi2_source, tau=tau_slider_ls, chi2_label=chi2_label), code = HISTORY_JS + """
+        const data = source.data;
+        const t = tau.value;
+        const x = data['x'];
+        const y = data['y'];
+        const hist = counts.data['h'];
+
+        var chi2 = 0;
+
+        for (var i = 0; i < x.length; i++){
+                y[i] = scale/t * Math.exp((-x[i])/t);
+        }
+
+        //ln(y) is clamped at 0 where y <= 1 and the relative error squared of a
+        //filled bin is 1/count, empty bins add nothing
+        const c = Math.log(scale/t);
+        for (var i = 0; i < hist.length; i++){
+                if (hist[i] > 0){
+                        const y_ls = Math.max(c - (x0 + i*d)/t, 0);
+                        chi2 += hist[i] * (Math.log(hist[i]) - y_ls)**2;
+                }
+        }
+
+         chi2_label.text = 'X^2 = ' + chi2.toFixed(2);
+
+        record_point(chi2_source, t, chi2, (a, b) => a < b);
+        source.change.emit();
+    """)
+
+    tau_slider_ls.js_on_change('value',callback_ls)
+
+    chi2_button = Button(label="Minimize X^2", button_type="success")
+    chi2_button.js_on_click(CustomJS(args=dict(tau=tau_slider_ls, chi2_label=chi2_label, tau_hat=round(ls_fit['tau'], 3),
+                                               fit_text=fit_label_text('X^2', ls_fit)), code="""
+        tau.value = tau_hat;
+        chi2_label.text = fit_text;
+    """))
+
+    chi2_plot.add_layout(chi2_label)
+
+    #Legend location and interaction option
+    plot.legend.location = "top_right"
+    plot.legend.click_policy = "hide"
+
+    #Poisson fit of N*exp(-t/tau)/tau + B, shown on demand
+    with instruments.stage('background'):
+        background_fit = fit_background(hist, edges)
+    instruments.count('background iterations', background_fit['iterations'])
+    background_button = background_fit_controls(plot, edges, background_fit)
+
+    return plot, tau_slider, lnL_plot, tau_slider_ls, chi2_plot, button, chi2_button, background_button
+
+def fitting_panel(hist, edges, decays=None, instruments=None, max_points=MAX_POINTS, log_y=False):
+    """The histogram plot with the fit controls beside it, as laid out on the page."""
+    plot, tau_slider, lnL_plot, tau_slider_ls, chi2_plot, button, chi2_button, background_button = MLE_LS_curve_fitting(
+        hist, edges, decays, max_points, log_y, instruments)
+    return plot, column(tau_slider, lnL_plot, button, tau_slider_ls, chi2_plot, chi2_button, background_button)
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+Extra Bokeh panels shared by the Muon Decay pages.
+"""
+import numpy as np
+
+from bokeh.layouts import column, row
+from bokeh.models import Button, ColumnDataSource, CustomJS, Div, HoverTool, Slider
+from bokeh.plotting import figure
+
+from .data import NO_DECAY
+from .decimate import MAX_POINTS, lttb, minmax_bins
+from .fit import background_curve, bin_centres, model_curves
+from .health import JITTER_OFFSETS
+from .rebin import rebin
+
+#JS defining record_point(source, t, value, better), which adds a visited tau
+#to a ln(L) or X^2 scatter source and keeps its best point highlighted. The
+#visited taus and the index of the best point are kept on the source itself,
+#so each slider move costs O(1) and only streams the new point and patches
+#the old best one, however many points there are.
+HISTORY_JS = """
+        function record_point(source, t, value, better) {
+                if (source.visited === undefined) {
+                        const xs = source.data['x'];
+                        const ys = source.data['y'];
+                        source.visited = new Map();
+                        source.best = 0;
+                        for (var i = 0; i < xs.length; i++){
+                                source.visited.set(xs[i], i);
+                                if (better(ys[i], ys[source.best])) {
+                                        source.best = i;
+                                }
+                        }
+                }
+                if (isNaN(value) || source.visited.has(t)) {
+                        return;
+                }
+                const index = source.data['x'].length;
+                const is_best = better(value, source.data['y'][source.best]);
+                source.visited.set(t, index);
+                if (is_best) {
+                        source.patch({color: [[source.best, '#0000ff']], size: [[source.best, 4]]});
+                        source.best = index;
+                }
+                source.stream({x: [t], y: [value], color: [is_best ? '#ff0000' : '#0000ff'], size: [is_best ? 10 : 4]});
+        }
+"""
+
+#Lowest count drawn on a log y axis, where 0 is infinitely far down
+LOG_FLOOR = 0.5
+
+#JS defining minmax_bins(h, e, max_points, start, stop, floor), the same buckets as
+#decimate.minmax_bins for counts h and edges e, found by binary search so a
+#zoom only costs the bins in view
+MINMAX_JS = """
+        function edge_index(e, value, right) {
+                var lo = 0, hi = e.length;
+                while (lo < hi) {
+                        const mid = (lo + hi) >> 1;
+                        if (right ? e[mid] <= value : e[mid] < value) {
+                                lo = mid + 1;
+                        } else {
+                                hi = mid;
+                        }
+                }
+                return lo;
+        }
+        function minmax_bins(h, e, max_points, start, stop, floor) {
+                const n = h.length;
+                const first = Math.min(Math.max(edge_index(e, start, true) - 1, 0), n - 1);
+                const last = Math.max(Math.min(edge_index(e, stop, false), n), first + 1);
+                const size = Math.ceil((last - first)/max_points);
+                const data = {left: [], right: [], x: [], min: [], max: [], low: [], high: []};
+                for (var i = first; i < last; i += size) {
+                        const end = Math.min(i + size, last);
+                        var lo = h[i], hi = h[i];
+                        for (var j = i + 1; j < end; j++) {
+                                lo = Math.min(lo, h[j]);
+                                hi = Math.max(hi, h[j]);
+                        }
+                        data.left.push(e[i]);
+                        data.right.push(e[end]);
+                        data.x.push((e[i] + e[end])/2);
+                        data.min.push(Math.max(lo, floor));
+                        data.max.push(Math.max(hi, floor));
+                        data.low.push(Math.max(lo - Math.sqrt(lo), floor));
+                        data.high.push(Math.max(hi + Math.sqrt(hi), floor));
+                }
+                return data;
+        }
+"""
+
+def histogram_glyphs(plot, hist, edges, max_points=MAX_POINTS, counts=None, log_y=False):
+    """
+    Histogram counts and their error bars on plot, each one glyph drawn from
+    the min/max buckets of decimate.minmax_bins, cut off at LOG_FLOOR on a
+    log y axis. When there are more bins than max_points the page keeps the
+    full counts, in column 'h' of counts when the page already sends them,
+    and redoes the buckets for the bins in view whenever the x range changes.
+    """
+    floor = LOG_FLOOR if log_y else 0
+    source = ColumnDataSource(data=minmax_bins(hist, edges, max_points, floor=floor))
+    plot.quad(top='max', bottom='min', left='left', right='right', source=source)
+    plot.segment(x0='x', y0='low', x1='x', y1='high', source=source)
+    if len(hist) > max_points:
+        if counts is None:
+            counts = ColumnDataSource(data=dict(h=np.asarray(hist, dtype=np.int32)))
+        bin_edges = ColumnDataSource(data=dict(e=np.asarray(edges, dtype=float)))
+        refine = CustomJS(args=dict(source=source, counts=counts, bin_edges=bin_edges, x_range=plot.x_range,
+                                    max_points=max_points, floor=floor), code=MINMAX_JS + """
+        source.data = minmax_bins(counts.data['h'], bin_edges.data['e'], max_points, x_range.start, x_range.end, floor);
+    """)
+        plot.x_range.js_on_change('start', refine)
+        plot.x_range.js_on_change('end', refine)
+    return source
+
+def add_fit_curve(plot, edges, n_events, fit, color='#008000', visible=True):
+    """Fixed curve of a fit result on the histogram plot, labelled with tau and its error."""
+    edges = np.asarray(edges, dtype=float)
+    x = bin_centres(edges)
+    if fit['method'] == 'background':
+        y = background_curve((fit['N'], fit['tau'], fit['B']), x, np.diff(edges))
+    else:
+        y = model_curves([fit['tau']], x, n_events, edges[1] - edges[0])[0]
+    kept = lttb(x, y)
+    x, y = x[kept], y[kept]
+    label = '%s tau = %.3f +/- %.3f' % (fit['method'].capitalize(), fit['tau'], fit['sigma'])
+    return plot.line(x, y, line_width=2, line_color=color, line_dash='dashed', legend_label=label, visible=visible)
+
+def background_fit_controls(plot, edges, fit):
+    """
+    Button showing the fit with a flat background, see fit.fit_background,
+    on the histogram plot, with its parameters in a div underneath.
+    """
+    curve = add_fit_curve(plot, edges, None, fit, color='#800080', visible=False)
+    correlation = fit['cov'][1, 2]/(fit['sigma']*fit['B_sigma'])
+    details = Div(text='tau = %.4f +/- %.4f, N = %.0f +/- %.0f, B = %.3f +/- %.3f per us, corr(tau, B) = %.2f'
+                  % (fit['tau'], fit['sigma'], fit['N'], fit['N_sigma'], fit['B'], fit['B_sigma'], correlation),
+                  width=400, visible=False)
+    button = Button(label="Fit with background", button_type="success")
+    button.js_on_click(CustomJS(args=dict(curve=curve, button=button, details=details), code="""
+        curve.visible = !curve.visible;
+        details.visible = curve.visible;
+        button.label = curve.visible ? "Hide background fit" : "Fit with background";
+    """))
+    return column(button, details)
+
+def _rebinned_data(fine_edges, cumulative, factor, tau):
+    hist, edges = rebin(fine_edges, cumulative, factor)
+    x = bin_centres(edges)
+    error = np.sqrt(hist)
+    curve = model_curves([tau], x, hist.sum(), edges[1] - edges[0])[0]
+    return dict(left=edges[:-1], right=edges[1:], top=hist, x=x, low=hist - error, high=hist + error, curve=curve)
+
+def bin_width_panel(fine_edges, cumulative, scan, width=0.05):
+    """
+    Histogram with a bin width slider and the tau scan of
+    rebin.bin_width_scan. The page gets the cumulative counts once and
+    rebins them itself, so moving the slider sends nothing new.
+    """
+    fine_width = fine_edges[1] - fine_edges[0]
+    widths = scan['widths']
+    start = int(np.argmin(np.abs(widths - width)))
+    source = ColumnDataSource(data=_rebinned_data(fine_edges, cumulative, int(round(widths[start]/fine_width)),
+                                                  scan['MLE']['tau'][start]))
+    #32 bit counts travel to the page as a binary array
+    cumulative_source = ColumnDataSource(data=dict(c=np.asarray(cumulative, dtype=np.int32)))
+
+    plot = figure(title="Decays rebinned to the chosen width", width=400, height=400)
+    plot.quad(top='top', bottom=0, left='left', right='right', source=source, fill_alpha=0.3)
+    plot.segment(x0='x', y0='low', x1='x', y1='high', source=source)
+    plot.line('x', 'curve', source=source, line_width=2, line_color='#ff0000', legend_label='MLE at this width')
+    plot.xaxis.axis_label = "Time in microseconds"
+    plot.yaxis.axis_label = "Number of decays"
+
+    scan_source = ColumnDataSource(data=dict(width=widths, mle=scan['MLE']['tau'], ls=scan['LS']['tau'],
+                                             mle_low=scan['MLE']['tau'] - scan['MLE']['sigma'],
+                                             mle_high=scan['MLE']['tau'] + scan['MLE']['sigma']))
+    scan_plot = figure(title="Tau in relation to bin width", width=400, height=400)
+    scan_plot.segment(x0='width', y0='mle_low', x1='width', y1='mle_high', source=scan_source, line_color='#ff0000')
+    scan_plot.scatter('width', 'mle', source=scan_source, color='#ff0000', size=4, legend_label='MLE')
+    scan_plot.scatter('width', 'ls', source=scan_source, color='#ffa500', size=4, legend_label='LS')
+    scan_plot.xaxis.axis_label = "Bin width in microseconds"
+    scan_plot.yaxis.axis_label = "Value of tau"
+    scan_plot.legend.location = "bottom_right"
+    scan_plot.tools.append(HoverTool(tooltips=[("width","@width"),("tau (MLE)","@mle"),("tau (LS)","@ls")]))
+
+    step = float(widths[1] - widths[0]) if len(widths) > 1 else float(widths[0])
+    slider = Slider(start=float(widths[0]), end=float(widths[-1]), value=float(widths[start]), step=step,
+                    title="Bin width in microseconds")
+    slider.js_on_change('value', CustomJS(args=dict(source=source, cumulative_source=cumulative_source,
+                                                    widths=list(widths), taus=list(scan['MLE']['tau']),
+                                                    fine_width=fine_width), code="""
+        const c = cumulative_source.data['c'];
+        const w = cb_obj.value;
+        //The fit at the scanned width closest to the slider
+        var nearest = 0;
+        for (var i = 1; i < widths.length; i++){
+                if (Math.abs(widths[i] - w) < Math.abs(widths[nearest] - w)) {
+                        nearest = i;
+                }
+        }
+        const tau = taus[nearest];
+        const factor = Math.max(1, Math.round(w/fine_width));
+        const bins = Math.floor((c.length - 1)/factor);
+        const width = factor*fine_width;
+        const total = c[bins*factor];
+        const data = {left: [], right: [], top: [], x: [], low: [], high: [], curve: []};
+        for (var i = 0; i < bins; i++){
+                const count = c[(i + 1)*factor] - c[i*factor];
+                const x = (i + 0.5)*width;
+                data.left.push(i*width);
+                data.right.push((i + 1)*width);
+                data.top.push(count);
+                data.x.push(x);
+                data.low.push(count - Math.sqrt(count));
+                data.high.push(count + Math.sqrt(count));
+                data.curve.push(total*width/tau*Math.exp(-x/tau));
+        }
+        source.data = data;
+    """))
+    return column(slider, plot, scan_plot)
+
+def page_header(width=1900):
+    """Title, introduction header and introduction text of the Muon Decay pages."""
+    #Define CSS style for HTML divs
+    style_title = {'font-size': '300%', 'font-family':'Georgia, serif'}
+    style_div = {'font-size': '200%', 'font-family':'Georgia, serif', 'width':'%dpx' % width}
+
+    header = Div(text = """
+             <header> Muon Decay </header>
+             """
+             , style = style_title)
+
+    intro_header = Div(text = """
+             <header> Introduction </header>
+             """
+             , style = style_div)
+
+    intro = Div(text = """
+         <div>
+         In this experiment we attempt to determine the mean lifetime of muons. This
+         will be done by detecting muons and muon decays using a scintillator detector
+         and specialized software. The data will be filtered so as to only use data points
+         from the detection of decays. Once filtered the data is binned and curve fit using the Maximum
+         Likelyhood and Least Squares methods. We will test both methods on a set of
+         data we simulate ourselves using the known mean lifetime as well as the data set from our detector.
+         </div>
+         """
+         , style = style_div)
+    return header, intro_header, intro
+
+def rolling_lifetime_plot(result):
+    """Time series of the windowed tau fits from window.rolling_lifetime."""
+    fitted = ~np.isnan(result['mle'])
+    #Bokeh datetime axes count milliseconds
+    source = ColumnDataSource(data=dict(
+        time=result['centre'][fitted]*1000, events=result['events'][fitted], rate=result['rate'][fitted],
+        mle=result['mle'][fitted], mle_low=(result['mle'] - result['mle_sigma'])[fitted],
+        mle_high=(result['mle'] + result['mle_sigma'])[fitted], ls=result['ls'][fitted]))
+
+    plot = figure(title="Tau in relation to time", width=400, height=400, x_axis_type='datetime')
+    plot.segment(x0='time', y0='mle_low', x1='time', y1='mle_high', source=source, line_color='#ff0000')
+    plot.scatter('time', 'mle', source=source, color='#ff0000', size=4, legend_label='MLE')
+    plot.scatter('time', 'ls', source=source, color='#ffa500', size=4, legend_label='LS')
+    plot.xaxis.axis_label = "Window centre"
+    plot.yaxis.axis_label = "Value of tau"
+    plot.legend.location = "bottom_right"
+    plot.legend.click_policy = "hide"
+
+    hovertool = HoverTool(tooltips=[("tau (MLE)","@mle"),("tau (LS)","@ls"),("decays","@events"),
+                                    ("decays/hour","@rate"),("time","@time{%F %H:%M}")],
+                          formatters={'@time': 'datetime'})
+    plot.tools.append(hovertool)
+    return plot
+
+def detector_health_panel(health):
+    """
+    Muon rate over the run with its dead periods shaded, the spread of the
+    "no decay" records and a summary, from health.DetectorHealth.summary().
+    """
+    bin_seconds = health['bin_seconds']
+    counts = np.asarray(health['line_counts'], dtype=float)
+    #Bokeh datetime axes count milliseconds
+    centre = (health['origin'] + (np.arange(len(counts)) + 0.5)*bin_seconds)*1000.0
+    kept = lttb(centre, counts)
+    source = ColumnDataSource(data=dict(time=centre[kept], rate=counts[kept]/bin_seconds,
+                                        decays=np.asarray(health['decay_counts'])[kept]))
+    rate_plot = figure(title="Muon rate in relation to time", width=1000, height=400, x_axis_type='datetime')
+    if health['gaps']:
+        gaps = np.asarray(health['gaps'], dtype=float)
+        top = max(float(counts.max())/bin_seconds, 1.0)
+        rate_plot.quad(left=gaps[:, 0]*1000, right=gaps.sum(axis=1)*1000, bottom=0, top=top,
+                       fill_color='#808080', fill_alpha=0.3, line_alpha=0, legend_label='Dead')
+    rate_plot.line('time', 'rate', source=source, line_width=1, legend_label='Muons')
+    rate_plot.xaxis.axis_label = "Time"
+    rate_plot.yaxis.axis_label = "Muons per second, mean over %d s" % bin_seconds
+    rate_plot.legend.location = "bottom_right"
+    rate_plot.legend.click_policy = "hide"
+    hovertool = HoverTool(tooltips=[("muons/s","@rate"),("decays","@decays"),("time","@time{%F %H:%M}")],
+                          formatters={'@time': 'datetime'})
+    rate_plot.tools.append(hovertool)
+
+    offsets = np.asarray(health['offsets'])
+    offset_plot = figure(title="No decay records in relation to recorded time", width=400, height=400)
+    offset_plot.vbar(x=NO_DECAY + np.arange(len(offsets)), top=offsets, width=0.8)
+    offset_plot.xaxis.axis_label = "Recorded time in ns, the last bar for everything above"
+    offset_plot.yaxis.axis_label = "Number of records"
+
+    summary = Div(text="""
+        <b>Detector health</b><br>
+        %d lines, %d decays over %.1f h<br>
+        %.2f muons/s and %.2f decays/h while live<br>
+        %.1f h dead in %d gaps of %d s or more, %d seconds missing in all<br>
+        %d timestamps going back, %d far outside the run, %d malformed lines skipped<br>
+        No decay records %.2f ns above %d on average, %.1f%% at +%d to +%d ns
+        """ % (health['lines'], health['decays'], health['duration']/3600, health['muon_rate'],
+               health['decay_rate']*3600, health['dead_time']/3600, health['dead_periods'], health['dead_seconds'],
+               health['missing_seconds'], health['backwards'], health['outliers'], health['bad_lines'], health['mean_offset'] or 0, NO_DECAY,
+               100*(health['jitter_fraction'] or 0), JITTER_OFFSETS[0], JITTER_OFFSETS[1]), width=300)
+    return row(rate_plot, offset_plot, summary)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Any binning of a run from one cumulative count array.
+
+The decays are counted once on a fine grid, by default the detector's 1 ns
+resolution, and the running total is kept. The count in any bin whose edges
+lie on that grid is then the difference of two entries, so a coarser or a
+variable width binning costs O(bins) instead of another pass over the
+events, and so does a scan of tau over many bin widths.
+"""
+import numpy as np
+
+from .fit import fit_tau
+
+#Decay times are whole ns
+FINE_WIDTH = 0.001
+#Bin widths in us of the default scan, 10 ns to 0.5 us
+SCAN_WIDTHS = np.round(np.arange(0.01, 0.501, 0.01), 3)
+
+def cumulative_counts(decays, tau_max=20, fine_width=FINE_WIDTH):
+    """
+    Fine grid edges and the number of decays below each of them, from
+    decays in us. Times are placed on the grid with a tolerance of a
+    millionth of a fine bin, so whole ns never fall into the bin below.
+    """
+    n_fine = int(round(tau_max/fine_width))
+    index = np.floor(np.asarray(decays, dtype=float)/fine_width + 1e-6).astype(np.int64)
+    #A decay at exactly tau_max belongs to the last bin, as for np.histogram
+    index[index == n_fine] = n_fine - 1
+    index = index[(index >= 0) & (index < n_fine)]
+    cumulative = np.zeros(n_fine + 1, dtype=np.int64)
+    np.cumsum(np.bincount(index, minlength=n_fine), out=cumulative[1:])
+    return np.arange(n_fine + 1)*fine_width, cumulative
+
+def rebin(fine_edges, cumulative, factor):
+    """Histogram and edges of bins factor fine bins wide, a partial last bin dropped."""
+    stops = np.arange(0, len(cumulative), factor)
+    return np.diff(cumulative[stops]), fine_edges[stops]
+
+def rebin_edges(fine_edges, cumulative, edges):
+    """Histogram for arbitrary increasing edges, each moved to the nearest fine grid edge."""
+    stops = np.searchsorted(fine_edges, edges)
+    stops = np.clip(stops, 0, len(fine_edges) - 1)
+    previous = np.clip(stops - 1, 0, None)
+    nearer = np.abs(fine_edges[previous] - edges) < np.abs(fine_edges[stops] - edges)
+    stops = np.where(nearer, previous, stops)
+    return np.diff(cumulative[stops]), fine_edges[stops]
+
+def bin_width_scan(fine_edges, cumulative, widths=SCAN_WIDTHS, methods=('MLE', 'LS')):
+    """
+    Refit tau for every bin width in us, each a whole number of fine bins.
+    Returns the widths and per method arrays of tau and sigma.
+    """
+    fine_width = fine_edges[1] - fine_edges[0]
+    widths = np.asarray(widths, dtype=float)
+    result = dict(widths=widths)
+    for method in methods:
+        result[method] = dict(tau=np.full(len(widths), np.nan), sigma=np.full(len(widths), np.nan))
+    for i, width in enumerate(widths):
+        hist, edges = rebin(fine_edges, cumulative, max(int(round(width/fine_width)), 1))
+        if hist.sum() <= 0:
+            continue
+        for method in methods:
+            fit = fit_tau(hist, edges, method)
+            result[method]['tau'][i], result[method]['sigma'][i] = fit['tau'], fit['sigma']
+    return result
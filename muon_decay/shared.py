@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide state shared by every session of the Bokeh server app.
+
+bokeh serve runs the app script once per session, but imported modules only
+once per process, so datasets, histograms and fit results kept here are
+computed once and then read by all sessions. Arrays handed out are read-only.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .cache import LRUCache, load_decays_cached
+from .fit import (bin_centres, chi2_from_statistics, fit_tau, histogram_statistics, lnL_from_statistics, model_bases,
+                      model_curves)
+
+#Worker threads for fits, so session callbacks never block the event loop
+EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+#Histograms and best fits per (dataset hash, binning)
+histograms = LRUCache(maxsize=64)
+fits = LRUCache(maxsize=256)
+#Curve, ln(L) and X^2 per (dataset hash, binning, tau)
+evaluations = LRUCache(maxsize=10000)
+
+def _read_only(array):
+    array = np.asarray(array)
+    array.setflags(write=False)
+    return array
+
+def dataset(path):
+    """
+    Content hash and read-only decay times in us of a data file, loaded once
+    and again whenever its size or mtime changes.
+    """
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _datasets_lock:
+        if path not in _datasets or _datasets[path][0] != version:
+            decay_times, timestamps, info = load_decays_cached(path)
+            _datasets[path] = (version, info['hash'], _read_only(decay_times/1000))
+        return _datasets[path][1:]
+
+def histogram(path, bins=400, tau_max=20):
+    """Histogram, edges and statistics of a data file for the given binning."""
+    key, decays = dataset(path)
+    def compute():
+        hist, edges = np.histogram(decays, bins=bins, range=(0, tau_max))
+        return _read_only(hist), _read_only(edges), histogram_statistics(hist, edges)
+    return histograms.get((key, bins, tau_max), compute)
+
+def best_fit(path, method, bins=400, tau_max=20):
+    key, decays = dataset(path)
+    hist, edges, stats = histogram(path, bins, tau_max)
+    return fits.get((key, bins, tau_max, method), lambda: fit_tau(hist, edges, method))
+
+def evaluate(path, tau, bins=400, tau_max=20):
+    """Model curve, ln(L) and X^2 at tau, shared by every session asking for it."""
+    key, decays = dataset(path)
+    hist, edges, stats = histogram(path, bins, tau_max)
+    def compute():
+        curve = model_curves([tau], bin_centres(edges), stats['H'], stats['d'])[0]
+        return _read_only(curve), float(lnL_from_statistics(stats, tau)), float(chi2_from_statistics(stats, tau))
+    return evaluations.get((key, bins, tau_max, round(tau, 6)), compute)
+
+def cache_stats():
+    return dict(histograms=histograms.stats(), fits=fits.stats(), evaluations=evaluations.stats(),
+                models=model_bases.stats())
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo muon decays with the detector's main effects.
+
+Decays are drawn with numpy.random.Generator in fixed size batches, smeared
+by the timing resolution, mixed with a flat background of accidentals and cut
+to the acceptance window, so large samples go straight into histogram counts
+in bounded memory.
+"""
+import numpy as np
+
+#The detector records decays up to 40 us, see data.NO_DECAY
+ACCEPTANCE_US = 40.0
+BATCH_SIZE = 2**20
+
+def _batch(rng, n, tau, background, resolution, acceptance):
+    #Each event is background with probability background, a decay otherwise
+    n_background = rng.binomial(n, background) if background > 0 else 0
+    times = np.empty(n)
+    times[:n - n_background] = rng.exponential(tau, n - n_background)
+    times[n - n_background:] = rng.uniform(0, acceptance, n_background)
+    if resolution > 0:
+        times += rng.normal(0, resolution, n)
+    #Whole ns as the detector reports them
+    times = np.floor(times*1000)/1000
+    return times[(times >= 0) & (times < acceptance)]
+
+def iter_decays(n, tau=2.2, background=0.0, resolution=0.0, acceptance=ACCEPTANCE_US, seed=None, batch_size=BATCH_SIZE):
+    """
+    Yield the accepted decay times in us of n simulated events, batch_size
+    at a time.
+
+    background is the fraction of events that are flat accidentals over the
+    acceptance window and resolution the Gaussian timing resolution in us.
+    seed is anything numpy.random.default_rng accepts, the same seed and
+    batch_size always give the same sample.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, batch_size):
+        yield _batch(rng, min(batch_size, n - start), tau, background, resolution, acceptance)
+
+def simulate_decays(n, tau=2.2, background=0.0, resolution=0.0, acceptance=ACCEPTANCE_US, seed=None):
+    """All accepted decay times in us of n simulated events as one array."""
+    batches = list(iter_decays(n, tau, background, resolution, acceptance, seed))
+    return np.concatenate(batches) if batches else np.empty(0)
+
+def simulate_histogram(n, edges, tau=2.2, background=0.0, resolution=0.0, acceptance=ACCEPTANCE_US, seed=None,
+                       batch_size=BATCH_SIZE):
+    """
+    Histogram counts of n simulated events in the given bin edges, filled
+    batch by batch so the full event array never exists.
+    """
+    edges = np.asarray(edges, dtype=float)
+    hist = np.zeros(len(edges) - 1, dtype=np.int64)
+    for times in iter_decays(n, tau, background, resolution, acceptance, seed, batch_size):
+        hist += np.histogram(times, bins=edges)[0]
+    return hist
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Timestamp-indexed store of decays for time range queries.
+
+Usage: python -m muon_decay.store STORE add RUN.data [RUN2.data ...]
+       python -m muon_decay.store STORE fit [--start DATE] [--stop DATE] [--hours 22-6]
+
+A store is a directory holding one segment per appended run: its decay
+times (int32 ns) and unix timestamps (int64) sorted by timestamp as .npy
+files, and for every BLOCK_EVENTS of them the smallest and largest
+timestamp. An index.json lists the segments and their time spans.
+
+A query for [start, stop) skips the segments outside it, finds the first
+and last block that overlap it by binary search in the block summaries and
+then searches inside those two blocks only, so apart from a few pages of
+the memory-mapped columns it reads just the selected decays.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+
+import numpy as np
+
+from .data import load_decays
+from .fit import fit_tau, fit_unbinned, unbinned_statistics
+
+#Decays per block of the timestamp summaries
+BLOCK_EVENTS = 4096
+INDEX = 'index.json'
+
+def merge_ranges(ranges):
+    """Sorted, non-overlapping [start, stop) ranges covering the same seconds as ranges."""
+    merged = []
+    for start, stop in sorted((int(start), int(stop)) for start, stop in ranges if stop > start):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return [tuple(r) for r in merged]
+
+def daily_ranges(start, stop, from_hour, to_hour, utc_offset_hours=0):
+    """
+    The [start, stop) ranges between from_hour and to_hour local time of
+    every day from start to stop, in unix seconds. A to_hour at or before
+    from_hour runs past midnight, so from_hour=22, to_hour=6 is the night
+    shift.
+    """
+    offset = int(utc_offset_hours*3600)
+    length = int(((to_hour - from_hour) % 24 or 24)*3600)
+    first_day = (int(start) + offset)//86400 - 1
+    ranges = []
+    for day in range(first_day, (int(stop) + offset)//86400 + 1):
+        begin = day*86400 + int(from_hour*3600) - offset
+        ranges.append((max(begin, int(start)), min(begin + length, int(stop))))
+    return merge_ranges(ranges)
+
+def block_summaries(stamps, block_events=BLOCK_EVENTS):
+    """(blocks, 2) array of the smallest and largest of each block_events of the sorted stamps."""
+    stamps = np.asarray(stamps)
+    if not len(stamps):
+        return np.empty((0, 2), dtype=np.int64)
+    lows = stamps[::block_events]
+    highs = stamps[np.minimum(np.arange(block_events - 1, len(stamps) + block_events - 1, block_events),
+                              len(stamps) - 1)]
+    return np.stack([lows, highs], axis=1).astype(np.int64)
+
+class Segment:
+    """The memory-mapped columns of one appended run and their block summaries."""
+    def __init__(self, directory, meta):
+        self.meta = meta
+        base = os.path.join(directory, meta['name'])
+        self.times = np.load(base + '.times.npy', mmap_mode='r')
+        self.stamps = np.load(base + '.stamps.npy', mmap_mode='r')
+        self.blocks = np.load(base + '.blocks.npy')
+        self.block_events = meta['block_events']
+
+    def __len__(self):
+        return len(self.stamps)
+
+    def _position(self, stamp):
+        """Index of the first decay at or after stamp, searching a single block."""
+        block = int(np.searchsorted(self.blocks[:, 1], stamp, side='left'))
+        if block == len(self.blocks):
+            return len(self.stamps)
+        lo = block*self.block_events
+        hi = min(lo + self.block_events, len(self.stamps))
+        return lo + int(np.searchsorted(self.stamps[lo:hi], stamp, side='left'))
+
+    def slice(self, start, stop):
+        """The slice of the columns with timestamps in [start, stop)."""
+        if not len(self) or stop <= self.meta['first'] or start > self.meta['last']:
+            return slice(0, 0)
+        return slice(self._position(start), self._position(stop))
+
+class EventStore:
+    """
+    Decays with their timestamps in a directory, appended a run at a time
+    and queried by lists of [start, stop) ranges of unix seconds. A range of
+    None selects everything.
+    """
+    def __init__(self, directory, block_events=BLOCK_EVENTS):
+        self.directory = directory
+        self.block_events = block_events
+        self.segments = []
+        index = os.path.join(directory, INDEX)
+        if os.path.exists(index):
+            with open(index) as file:
+                for meta in json.load(file)['segments']:
+                    self.segments.append(Segment(directory, meta))
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def span(self):
+        """First and last timestamp in the store, None for an empty one."""
+        if not len(self):
+            return None
+        return (min(s.meta['first'] for s in self.segments if len(s)),
+                max(s.meta['last'] for s in self.segments if len(s)))
+
+    def _write_index(self):
+        temp = os.path.join(self.directory, INDEX + '.tmp')
+        with open(temp, 'w') as file:
+            json.dump(dict(segments=[segment.meta for segment in self.segments]), file, indent=1)
+        os.replace(temp, os.path.join(self.directory, INDEX))
+
+    def append(self, times, stamps, source=None):
+        """Add a run of decay times in ns and their timestamps as a new segment, returning its name."""
+        os.makedirs(self.directory, exist_ok=True)
+        order = np.argsort(stamps, kind='stable')
+        stamps = np.asarray(stamps, dtype=np.int64)[order]
+        times = np.asarray(times, dtype=np.int32)[order]
+        name = 'segment%05d' % len(self.segments)
+        base = os.path.join(self.directory, name)
+        columns = ((times, '.times.npy'), (stamps, '.stamps.npy'),
+                   (block_summaries(stamps, self.block_events), '.blocks.npy'))
+        for column, suffix in columns:
+            temp = base + suffix + '.tmp.npy'
+            np.save(temp, column)
+            os.replace(temp, base + suffix)
+        meta = dict(name=name, source=source, events=len(stamps), block_events=self.block_events,
+                    first=int(stamps[0]) if len(stamps) else None, last=int(stamps[-1]) if len(stamps) else None)
+        #The index is written last, so a half written segment is never read
+        self.segments.append(Segment(self.directory, meta))
+        self._write_index()
+        return name
+
+    def append_file(self, path):
+        """Add the decays of a detector file as a new segment."""
+        times, stamps, info = load_decays(path)
+        return self.append(times, stamps, source=os.path.abspath(path))
+
+    def select(self, ranges=None):
+        """Decay times in ns and timestamps of the decays in any of the ranges, in timestamp order per segment."""
+        ranges = [(-2**62, 2**62)] if ranges is None else merge_ranges(ranges)
+        times, stamps = [], []
+        for segment in self.segments:
+            for start, stop in ranges:
+                part = segment.slice(start, stop)
+                if part.stop > part.start:
+                    times.append(np.asarray(segment.times[part]))
+                    stamps.append(np.asarray(segment.stamps[part]))
+        if not times:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+        return np.concatenate(times), np.concatenate(stamps)
+
+    def count(self, ranges=None):
+        """Number of decays in the ranges, from the indexes alone."""
+        ranges = [(-2**62, 2**62)] if ranges is None else merge_ranges(ranges)
+        total = 0
+        for segment in self.segments:
+            for start, stop in ranges:
+                part = segment.slice(start, stop)
+                total += part.stop - part.start
+        return total
+
+    def histogram(self, edges, ranges=None):
+        """Histogram counts in the bin edges (us) of the decays in the ranges."""
+        times, stamps = self.select(ranges)
+        return np.histogram(times/1000, bins=edges)[0]
+
+    def fit(self, edges, ranges=None):
+        """The binned MLE and LS and the unbinned fit of tau for the decays in the ranges."""
+        times, stamps = self.select(ranges)
+        decays = times/1000
+        hist = np.histogram(decays, bins=edges)[0]
+        return dict(MLE=fit_tau(hist, edges, 'MLE'), LS=fit_tau(hist, edges, 'LS'),
+                    unbinned=fit_unbinned(unbinned_statistics(decays, (edges[0], edges[-1]))))
+
+def parse_time(text):
+    """Unix seconds of a number or an ISO date, taken as UTC unless it says otherwise."""
+    try:
+        return int(float(text))
+    except ValueError:
+        moment = datetime.datetime.fromisoformat(text)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        return int(moment.timestamp())
+
+def main(argv=None):
+    from .cli import print_fits
+    parser = argparse.ArgumentParser(description="Append detector runs to an event store or fit a time range of it.")
+    parser.add_argument('store', help="store directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help="append detector files")
+    add.add_argument('files', nargs='+')
+    fit = commands.add_parser('fit', help="fit tau in a time range")
+    fit.add_argument('--start', type=parse_time, default=None, help="unix seconds or ISO date, UTC by default")
+    fit.add_argument('--stop', type=parse_time, default=None, help="unix seconds or ISO date, UTC by default")
+    fit.add_argument('--hours', default=None, help="only these hours of each day, e.g. 22-6 for night shifts")
+    fit.add_argument('--utc-offset', type=float, default=0, help="hours ahead of UTC of --hours")
+    fit.add_argument('--bins', type=int, default=400, help="histogram bins between 0 and --tau-max")
+    fit.add_argument('--tau-max', type=float, default=20, help="upper edge of the histogram in microseconds")
+    args = parser.parse_args(argv)
+
+    store = EventStore(args.store)
+    if args.command == 'add':
+        for path in args.files:
+            name = store.append_file(path)
+            print("%s: %d decays as %s" % (path, store.segments[-1].meta['events'], name))
+        return 0
+    span = store.span()
+    if span is None:
+        parser.error("%s holds no decays" % args.store)
+    start = span[0] if args.start is None else args.start
+    stop = span[1] + 1 if args.stop is None else args.stop
+    if args.hours:
+        from_hour, to_hour = (float(hour) for hour in args.hours.split('-'))
+        ranges = daily_ranges(start, stop, from_hour, to_hour, args.utc_offset)
+    else:
+        ranges = [(start, stop)]
+    print("%d decays in %d ranges" % (store.count(ranges), len(ranges)))
+    print_fits(store.fit(np.linspace(0, args.tau_max, args.bins + 1), ranges))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Consistency of the lifetime across subsets of a run.
+
+The decays are split into K chunks of equal size or of equal stretches of
+wall-clock time, histogrammed together into one (K, bins) array and every
+chunk is fitted in one vectorized pass with fit.fit_batch, so K can
+run to thousands. The spread of the chunk taus is then compared with their
+statistical errors: a run without drift has a spread close to the typical
+error and a chi^2 per degree of freedom close to 1.
+"""
+import sys
+import time
+
+import numpy as np
+
+from .toys import fit_toys
+
+def subset_labels(timestamps, k, by='count'):
+    """
+    Chunk index 0..k-1 of every decay. 'count' gives each chunk an equal
+    number of decays in time order, 'time' cuts the run into k equally long
+    stretches of time, which may leave some chunks empty.
+    """
+    timestamps = np.asarray(timestamps)
+    n = len(timestamps)
+    labels = np.empty(n, dtype=np.int64)
+    if by == 'count':
+        order = np.argsort(timestamps, kind='stable')
+        labels[order] = np.arange(n)*k//max(n, 1)
+    elif by == 'time':
+        first, last = timestamps.min(), timestamps.max()
+        span = max(last - first, 1)
+        labels[:] = np.minimum((timestamps - first)*k//span, k - 1)
+    else:
+        raise ValueError("by must be 'count' or 'time', not %r" % (by,))
+    return labels
+
+def subset_histograms(decays, labels, k, edges):
+    """
+    Histogram of every chunk as the rows of one (k, bins) array, filled by
+    a single bincount over chunk and bin index together.
+    """
+    edges = np.asarray(edges, dtype=float)
+    bins = len(edges) - 1
+    bin_index = np.searchsorted(edges, decays, side='right') - 1
+    #The last edge is inside the last bin, as for np.histogram
+    bin_index[decays == edges[-1]] = bins - 1
+    inside = (bin_index >= 0) & (bin_index < bins)
+    flat = np.asarray(labels)[inside]*bins + bin_index[inside]
+    return np.bincount(flat, minlength=k*bins).reshape(k, bins)
+
+def subset_study(decays, timestamps, k, edges, by='count', methods=('MLE', 'LS')):
+    """
+    Fit tau in each of k chunks of a run, see subset_labels, and summarise
+    how consistent they are.
+
+    decays are in us. Returns a dict with the events per chunk and, per
+    method, the chunk taus and sigmas, their weighted mean, the spread of
+    the taus, the rms of their sigmas as the spread expected from
+    statistics alone, the ratio of the two and the chi^2 of the taus about
+    the weighted mean with its degrees of freedom. Chunks too small to give
+    a tau and an error are left out of the summary.
+    """
+    hists = subset_histograms(decays, subset_labels(timestamps, k, by), k, edges)
+    result = dict(k=k, by=by, events=hists.sum(axis=1))
+    for method, fit in fit_toys(hists, edges, methods).items():
+        taus, sigmas = fit['tau'], fit['sigma']
+        ok = np.isfinite(taus) & np.isfinite(sigmas) & (sigmas > 0)
+        weights = 1/sigmas[ok]**2
+        mean = np.sum(weights*taus[ok])/np.sum(weights) if ok.any() else np.nan
+        expected = np.sqrt(np.mean(sigmas[ok]**2)) if ok.any() else np.nan
+        spread = taus[ok].std(ddof=1) if ok.sum() > 1 else np.nan
+        chi2 = np.sum(((taus[ok] - mean)/sigmas[ok])**2)
+        result[method] = dict(taus=taus, sigmas=sigmas, fitted=int(ok.sum()), mean=mean, spread=spread,
+                              expected=expected, ratio=spread/expected, chi2=chi2, ndf=int(ok.sum()) - 1)
+    return result
+
+def print_study(result, stream=sys.stdout):
+    stream.write("%d chunks by %s, %d to %d decays each\n"
+                 % (result['k'], result['by'], result['events'].min(), result['events'].max()))
+    for method in ('MLE', 'LS'):
+        if method not in result:
+            continue
+        summary = result[method]
+        stream.write("%-4s mean tau = %.4f, spread = %.4f, expected = %.4f (ratio %.2f), X^2/ndf = %.1f/%d\n"
+                     % (method, summary['mean'], summary['spread'], summary['expected'], summary['ratio'],
+                        summary['chi2'], summary['ndf']))
+
+if __name__ == '__main__':
+    from .data import load_decays
+    from .sim import simulate_decays
+    edges = np.linspace(0, 20, 401)
+    decay_times, timestamps, info = load_decays(sys.argv[1] if len(sys.argv) > 1 else "LevangieMcKeever_3000.data")
+    #The six chunks of 500 decays of MuonDataFit(1).m
+    print_study(subset_study(decay_times/1000, timestamps, 6, edges))
+    print_study(subset_study(decay_times/1000, timestamps, 6, edges, by='time'))
+    decays = simulate_decays(3000000, seed=2021)
+    start = time.perf_counter()
+    result = subset_study(decays, np.arange(len(decays)), 3000, edges)
+    print("3000 chunks of 1000 simulated decays fitted in %.2f s" % (time.perf_counter() - start))
+    print_study(result)
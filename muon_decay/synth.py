@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic detector files for load and scaling tests.
+
+Usage: python -m muon_decay.synth OUT.data [--duration S | --megabytes MB] [--rate R] [--tau US]
+                                           [--dead-rate P] [--truncate] [--seed N]
+
+The files have the "<time_ns> <unix_ts>" lines of a real run: every live
+second of the run gets one "no decay" record of 40000 ns plus a Poisson
+jitter, and every muon that decays in that second a line of its decay
+time, in either order. Seconds go missing now and then and whole dead
+periods can be switched on, so the timestamps rise with gaps but never go
+back. The defaults match LevangieMcKeever_3000.data, where about 97% of the
+lines are "no decay" records.
+
+The run is made and formatted block_seconds at a time with array
+operations, so memory stays bounded whatever the length of the run and a
+GB is written in well under a minute. The same seed and settings always
+give the same file.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from .data import NO_DECAY
+from .sim import ACCEPTANCE_US, iter_decays
+
+#Decays per second and mean "no decay" offset in ns of the sample run
+RATE = 3000/114532
+JITTER = 4.4
+#Fraction of seconds with no record at all
+SKIP = 0.005
+#Mean length in seconds of a dead period
+DEAD_SECONDS = 3600
+#First timestamp of the sample run
+START = 1550267950
+#Seconds made and formatted per block, peak memory is about 100 bytes per second
+BLOCK_SECONDS = 2**18
+
+def iter_records(duration, rate=RATE, tau=2.2, background=0.0, resolution=0.0, jitter=JITTER, skip=SKIP,
+                 dead_rate=0.0, dead_seconds=DEAD_SECONDS, start=START, seed=None, block_seconds=BLOCK_SECONDS):
+    """
+    Yield (times, timestamps) of the records of a run of duration seconds,
+    block_seconds of the run at a time, in file order.
+
+    rate is the mean number of decays per second, tau, background and
+    resolution are passed on to sim.iter_decays and jitter is the mean
+    offset above 40000 of the "no decay" records. Each second is missing
+    with probability skip and starts a dead period of on average
+    dead_seconds with probability dead_rate.
+    """
+    rng = np.random.default_rng(seed)
+    dead_until = start
+    for first in range(start, start + duration, block_seconds):
+        stamps = np.arange(first, min(first + block_seconds, start + duration), dtype=np.int64)
+        live = rng.random(len(stamps)) >= skip
+        live[stamps < dead_until] = False
+        if dead_rate > 0:
+            for dead in stamps[rng.random(len(stamps)) < dead_rate]:
+                if dead >= dead_until:
+                    dead_until = dead + int(np.ceil(rng.exponential(dead_seconds)))
+                    live[(stamps >= dead) & (stamps < dead_until)] = False
+        stamps = stamps[live]
+
+        counts = rng.poisson(rate, len(stamps))
+        batches = list(iter_decays(int(counts.sum()), tau, background, resolution, ACCEPTANCE_US, seed=rng))
+        decays = np.concatenate(batches) if batches else np.empty(0)
+        #Events smeared out of the acceptance are never recorded, their seconds are picked at random
+        if len(decays) < counts.sum():
+            second = np.repeat(np.arange(len(stamps)), counts)
+            kept = np.sort(rng.choice(len(second), len(decays), replace=False))
+            counts = np.bincount(second[kept], minlength=len(stamps))
+        decays = rng.permutation(np.minimum(np.round(decays*1000), NO_DECAY - 1).astype(np.int64))
+
+        #Each second is its "no decay" record at a random place among its decays
+        lines = counts + 1
+        record = np.cumsum(lines) - lines + rng.integers(0, lines)
+        times = np.empty(lines.sum(), dtype=np.int64)
+        is_record = np.zeros(len(times), dtype=bool)
+        is_record[record] = True
+        times[record] = NO_DECAY + rng.poisson(jitter, len(stamps))
+        times[~is_record] = decays
+        yield times, np.repeat(stamps, lines)
+
+#ASCII digits of 0 to 999, three to a row
+_THREE_DIGITS = np.frombuffer(b''.join(b'%03d' % i for i in range(1000)), dtype=np.uint8).reshape(1000, 3)
+
+def _digits(values, out):
+    """
+    ASCII digits of non-negative values, right aligned in the columns of
+    out, looked up three at a time. Digits above the lowest six are worked
+    out once per distinct value of values//10**6, which is a handful for the
+    timestamps of a block.
+    """
+    width = out.shape[1]
+    if width > 6:
+        high, low = np.divmod(values, 10**6)
+        lowest = int(high.min())
+        span = int(high.max()) - lowest + 1
+        if span < len(values):
+            table = np.empty((span, width - 6), dtype=np.uint8)
+            _digits(np.arange(lowest, lowest + span, dtype=np.int64), table)
+            out[:, :-6] = table[high - lowest]
+        else:
+            _digits(high, out[:, :-6])
+        values, width, out = low, 6, out[:, -6:]
+    values = values.astype(np.int32)
+    if width > 3:
+        values, low = np.divmod(values, 1000)
+        out[:, -3:] = _THREE_DIGITS[low]
+        width -= 3
+    out[:, :width] = _THREE_DIGITS[values, 3 - width:]
+
+def format_records(times, stamps):
+    """The bytes of "<time_ns> <unix_ts>" lines of the records, formatted without a Python loop."""
+    times = np.asarray(times, dtype=np.int64)
+    stamps = np.asarray(stamps, dtype=np.int64)
+    if not len(times):
+        return b''
+    widths = [len(str(int(values.max()))) for values in (times, stamps)]
+    chars = np.empty((len(times), widths[0] + widths[1] + 2), dtype=np.uint8)
+    keep = np.ones(chars.shape, dtype=bool)
+    column = 0
+    for values, width, end in zip((times, stamps), widths, (' ', '\n')):
+        _digits(values, chars[:, column:column + width])
+        #Leading zeros are dropped, the last digit always stays
+        if values.min() < 10**(width - 1):
+            np.greater_equal(values[:, None], 10**np.arange(width - 1, 0, -1), out=keep[:, column:column + width - 1])
+        column += width
+        chars[:, column] = ord(end)
+        column += 1
+    return chars[keep].tobytes()
+
+def write_detector_file(path, duration, truncate=False, **options):
+    """
+    Write a synthetic run of duration seconds to path, options as for
+    iter_records. With truncate the last line loses its line break and the
+    second half of its characters, as in a file cut off mid-write.
+
+    Returns a dict with the number of lines (a truncated one included),
+    decays and bytes written, the elapsed seconds and the bytes per second.
+    """
+    begin = time.perf_counter()
+    lines = decays = size = 0
+    last = b''
+    with open(path, 'wb') as file:
+        for times, stamps in iter_records(duration, **options):
+            #One block is held back so the end of the file can still be cut
+            file.write(last)
+            last = format_records(times, stamps)
+            lines += len(times)
+            decays += int(np.count_nonzero(times < NO_DECAY))
+            size += len(last)
+        if truncate and last:
+            line_start = last.rfind(b'\n', 0, len(last) - 1) + 1
+            cut = (len(last) - line_start)//2
+            last = last[:len(last) - cut]
+            size -= cut
+        file.write(last)
+    seconds = time.perf_counter() - begin
+    return dict(lines=lines, decays=decays, bytes=size, seconds=seconds,
+                bytes_per_second=size/seconds if seconds > 0 else float('inf'))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic detector run in the .data line format.")
+    parser.add_argument('output', help="data file to write")
+    length = parser.add_mutually_exclusive_group()
+    length.add_argument('--duration', type=int, default=None, help="seconds of run, those of the sample run by default")
+    length.add_argument('--megabytes', type=float, default=None, help="about this size of file instead of --duration")
+    parser.add_argument('--rate', type=float, default=RATE, help="decays per second")
+    parser.add_argument('--tau', type=float, default=2.2, help="lifetime in us")
+    parser.add_argument('--background', type=float, default=0.0, help="fraction of decays that are flat accidentals")
+    parser.add_argument('--resolution', type=float, default=0.0, help="timing resolution in us")
+    parser.add_argument('--jitter', type=float, default=JITTER, help="mean offset in ns of the no decay records")
+    parser.add_argument('--skip', type=float, default=SKIP, help="fraction of seconds with no record")
+    parser.add_argument('--dead-rate', type=float, default=0.0, help="chance per second of a dead period starting")
+    parser.add_argument('--dead-seconds', type=float, default=DEAD_SECONDS, help="mean length of a dead period")
+    parser.add_argument('--truncate', action='store_true', help="cut the last line off halfway")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the run, a fresh one by default")
+    args = parser.parse_args(argv)
+
+    duration = args.duration or 114532
+    if args.megabytes is not None:
+        #A live second takes one record and rate decay lines of about 17 bytes each
+        line_bytes = 5 + 1 + len(str(START)) + 1
+        duration = max(int(args.megabytes*2**20/(line_bytes*(1 - args.skip)*(1 + args.rate))), 1)
+    info = write_detector_file(args.output, duration, truncate=args.truncate, rate=args.rate, tau=args.tau,
+                               background=args.background, resolution=args.resolution, jitter=args.jitter,
+                               skip=args.skip, dead_rate=args.dead_rate, dead_seconds=args.dead_seconds,
+                               seed=args.seed)
+    print("%s: %d lines, %d decays, %.1f MB in %.2f s (%.0f MB/s)"
+          % (args.output, info['lines'], info['decays'], info['bytes']/2**20, info['seconds'],
+             info['bytes_per_second']/2**20))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
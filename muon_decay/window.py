@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Lifetime, decay rate and fit uncertainty in sliding windows of wall-clock
+time, to spot detector drift over multi-day runs.
+"""
+import numpy as np
+
+from .fit import batch_statistics, fit_batch
+
+#Windows with fewer decays than this are reported without a fit
+MIN_WINDOW_EVENTS = 50
+#Window histograms fitted together, bounded by their total number of bins
+BLOCK_BINS = 2**20
+
+def window_histograms(bin_index, lows, highs, bins):
+    """
+    Histograms of bin_index[lows[k]:highs[k]] as the rows of one array, each
+    the difference of the cumulative histograms at its two ends. The
+    decays between neighbouring window ends are counted in a single
+    bincount, so each is touched once however many windows hold it.
+    """
+    cuts, where = np.unique(np.concatenate([lows, highs]), return_inverse=True)
+    segments = np.repeat(np.arange(len(cuts) - 1), np.diff(cuts))
+    counts = np.bincount(segments*bins + bin_index[cuts[0]:cuts[-1]], minlength=(len(cuts) - 1)*bins)
+    cumulative = np.zeros((len(cuts), bins), dtype=np.int64)
+    np.cumsum(counts.reshape(len(cuts) - 1, bins), axis=0, out=cumulative[1:])
+    return cumulative[where[len(lows):]] - cumulative[where[:len(lows)]]
+
+def rolling_lifetime(decay_times, timestamps, edges, window_hours=6, step_hours=1, min_events=MIN_WINDOW_EVENTS):
+    """
+    Fit tau in windows of window_hours sliding on by step_hours.
+
+    decay_times are in ns and timestamps in unix seconds, as from load_decays.
+    The window histograms come from differences of cumulative histograms,
+    see window_histograms, and the windows are fitted block by block with
+    fit.fit_batch, their statistics from fit.batch_statistics.
+
+    Returns a dict of arrays with one entry per window: start and centre
+    (unix seconds), events, rate (decays per hour) and the MLE and LS tau
+    with their sigma, nan where a window has fewer than min_events decays.
+    """
+    edges = np.asarray(edges, dtype=float)
+    bins = len(edges) - 1
+    order = np.argsort(timestamps, kind='stable')
+    stamps = np.asarray(timestamps)[order]
+    decays = np.asarray(decay_times)[order]/1000
+    bin_index = np.searchsorted(edges, decays, side='right') - 1
+    inside = (bin_index >= 0) & (bin_index < bins)
+    stamps, bin_index = stamps[inside], bin_index[inside]
+
+    window = window_hours*3600
+    step = step_hours*3600
+    if len(stamps):
+        starts = np.arange(stamps[0], max(stamps[-1] - window, stamps[0]) + step, step)
+    else:
+        starts = np.empty(0)
+    lows = np.searchsorted(stamps, starts, side='left')
+    highs = np.searchsorted(stamps, starts + window, side='left')
+
+    events = (highs - lows).astype(float)
+    result = dict((key, np.full(len(starts), np.nan)) for key in ('mle', 'mle_sigma', 'ls', 'ls_sigma'))
+    result.update(events=events, rate=events/window_hours)
+    fitted = np.flatnonzero(events >= min_events)
+    block = max(BLOCK_BINS//bins, 1)
+    for first in range(0, len(fitted), block):
+        rows = fitted[first:first + block]
+        stats = batch_statistics(window_histograms(bin_index, lows[rows], highs[rows], bins), edges)
+        for method, key in (('MLE', 'mle'), ('LS', 'ls')):
+            fit = fit_batch(stats, method)
+            result[key][rows], result[key + '_sigma'][rows] = fit['tau'], fit['sigma']
+    result['start'] = starts
+    result['centre'] = starts + window/2
+    return result
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""Eviction keeps the cache under its size without dropping the entry just written."""
+import os
+
+from muon_decay.cache import load_decays_cached
+
+def write_run(path, n, first):
+    path.write_bytes(b''.join(b'%d %d\n' % (i % 20000, first + i) for i in range(n)))
+    return str(path)
+
+def test_evict_keeps_current_entry(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    old = write_run(tmp_path / 'old.data', 1000, 1550267950)
+    new = write_run(tmp_path / 'new.data', 2000, 1550277950)
+    assert not load_decays_cached(old, cache_dir)[2]['cached']
+    #Too small for either entry, so only the one just written may stay
+    assert not load_decays_cached(new, cache_dir, max_bytes=1)[2]['cached']
+    assert sorted(name.split('.', 1)[1] for name in os.listdir(cache_dir)) == ['json', 'stamps.npy', 'times.npy']
+    times, stamps, info = load_decays_cached(new, cache_dir, max_bytes=1)
+    assert info['cached']
+    assert len(times) == 2000
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Malformed lines in detector files are skipped and counted, never shift the lines after them."""
+import warnings
+
+import numpy as np
+import pytest
+
+from muon_decay.data import load_decays, parse_lines
+
+def detector_text(n, seed=0):
+    """n well formed lines, every tenth a decay, one line per second."""
+    rng = np.random.default_rng(seed)
+    times = np.where(np.arange(n) % 10 == 0, rng.integers(0, 20000, n), 40000 + rng.integers(0, 10, n))
+    stamps = 1550267950 + np.arange(n)
+    return [b'%d %d\n' % pair for pair in zip(times, stamps)], times, stamps
+
+@pytest.fixture
+def lines():
+    return detector_text(5000)
+
+def write(tmp_path, lines):
+    path = tmp_path / 'run.data'
+    path.write_bytes(b''.join(lines))
+    return str(path)
+
+def test_well_formed(tmp_path, lines):
+    text, times, stamps = lines
+    decay_times, decay_stamps, info = load_decays(write(tmp_path, text), chunk_bytes=4096)
+    assert info['bad_lines'] == 0
+    assert info['lines'] == len(times)
+    np.testing.assert_array_equal(decay_times, times[times < 40000])
+    np.testing.assert_array_equal(decay_stamps, stamps[times < 40000])
+
+def test_one_field_line(tmp_path, lines):
+    text, times, stamps = lines
+    text.insert(2500, b'40003\n')
+    decay_times, decay_stamps, info = load_decays(write(tmp_path, text), chunk_bytes=4096)
+    assert info['bad_lines'] == 1
+    assert info['health']['bad_lines'] == 1
+    assert info['health']['backwards'] == 0
+    np.testing.assert_array_equal(decay_times, times[times < 40000])
+    np.testing.assert_array_equal(decay_stamps, stamps[times < 40000])
+
+def test_non_numeric_token(tmp_path, lines):
+    text, times, stamps = lines
+    text[1000] = b'40x03 1550268950\n'
+    keep = np.arange(len(times)) != 1000
+    #The old parser only said so with a DeprecationWarning and dropped the rest of the chunk
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        decay_times, decay_stamps, info = load_decays(write(tmp_path, text), chunk_bytes=4096)
+    assert info['bad_lines'] == 1
+    assert info['lines'] == len(times) - 1
+    decay = keep & (times < 40000)
+    np.testing.assert_array_equal(decay_times, times[decay])
+    np.testing.assert_array_equal(decay_stamps, stamps[decay])
+
+def test_truncated_last_line(tmp_path, lines):
+    text, times, stamps = lines
+    text.append(b'40006 15')
+    decay_times, decay_stamps, info = load_decays(write(tmp_path, text))
+    assert info['bad_lines'] == 1
+    assert info['lines'] == len(times)
+    assert info['health']['last'] == stamps[-1]
+    np.testing.assert_array_equal(decay_times, times[times < 40000])
+
+def test_outlier_timestamp(tmp_path, lines):
+    text, times, stamps = lines
+    #Well formed but thousands of years after the run, counted instead of stretching the series
+    text.insert(1000, b'40003 99999999999\n')
+    decay_times, decay_stamps, info = load_decays(write(tmp_path, text), chunk_bytes=4096)
+    health = info['health']
+    assert info['lines'] == len(times) + 1
+    assert health['outliers'] == 1
+    assert health['backwards'] == 0
+    assert health['last'] == stamps[-1]
+    assert len(health['line_counts']) <= len(times)//health['bin_seconds'] + 2
+    assert sum(health['line_counts']) == len(times)
+    np.testing.assert_array_equal(decay_times, times[times < 40000])
+
+def test_parse_lines_blank_and_extra_fields():
+    times, stamps, bad = parse_lines(b'40003 1000\r\n\r\n  5000\t1003  \n1 2 3\n99999999999 5\n7 8\n')
+    np.testing.assert_array_equal(times, [40003, 5000, 7])
+    np.testing.assert_array_equal(stamps, [1000, 1003, 8])
+    assert bad == 3
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""fit_batch gives every row the fit fit_tau gives the histogram on its own, fit_background keeps B >= 0."""
+import warnings
+
+import numpy as np
+import pytest
+
+from muon_decay.fit import batch_statistics, fit_background, fit_batch, fit_tau
+from muon_decay.sim import simulate_histogram
+from muon_decay.toys import toy_histograms
+
+EDGES = np.linspace(0, 20, 401)
+
+@pytest.fixture(scope='module')
+def hists():
+    return toy_histograms(200, 3000, EDGES, 2.2, rng=1)
+
+@pytest.mark.parametrize('method', ['MLE', 'LS'])
+def test_fit_batch_matches_fit_tau(hists, method):
+    batch = fit_batch(batch_statistics(hists, EDGES), method)
+    single = [fit_tau(hist, EDGES, method) for hist in hists]
+    for key in ('tau', 'lower', 'upper', 'sigma', 'value'):
+        np.testing.assert_allclose(batch[key], [fit[key] for fit in single], rtol=1e-9, err_msg=key)
+
+@pytest.mark.parametrize('method', ['MLE', 'LS'])
+def test_fit_batch_empty_rows(hists, method):
+    rows = np.concatenate([np.zeros((1, hists.shape[1])), hists[:2], np.zeros((1, hists.shape[1]))])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        batch = fit_batch(batch_statistics(rows, EDGES), method)
+    for key in ('tau', 'lower', 'upper', 'sigma', 'value'):
+        assert np.isnan(batch[key][[0, 3]]).all(), key
+        assert np.isfinite(batch[key][1:3]).all(), key
+        np.testing.assert_allclose(batch[key][1:3], fit_batch(batch_statistics(hists[:2], EDGES), method)[key])
+
+def test_fit_background_without_background():
+    #About half of these runs would fit a negative B without the bound
+    for seed in range(20):
+        fit = fit_background(simulate_histogram(3000, EDGES, seed=seed), EDGES)
+        assert fit['converged']
+        assert fit['B'] >= 0
+        assert fit['iterations'] <= 20
+
+def test_fit_background_with_background():
+    fit = fit_background(simulate_histogram(30000, EDGES, background=0.1, seed=1), EDGES)
+    assert fit['converged']
+    assert fit['B'] > 5*fit['B_sigma']
+    assert abs(fit['tau'] - 2.2) < 3*fit['sigma']
+
+def test_fit_background_not_converged():
+    with pytest.warns(RuntimeWarning, match='did not converge'):
+        fit = fit_background(simulate_histogram(3000, EDGES, seed=1), EDGES, max_iterations=1)
+    assert not fit['converged']
+
+def test_fit_background_single_decay():
+    hist = np.zeros(len(EDGES) - 1)
+    hist[300] = 1
+    with pytest.warns(RuntimeWarning, match='did not converge'):
+        fit = fit_background(hist, EDGES)
+    assert not fit['converged']
+    assert np.isnan(fit['sigma']) and np.isnan(fit['cov']).all()
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""The in-browser page sends the counts once and at most max_points curve points, whatever the binning."""
+import numpy as np
+import pytest
+
+from bokeh.embed import file_html
+from bokeh.layouts import row
+from bokeh.resources import CDN
+
+from muon_decay import page_js
+from muon_decay.decimate import MAX_POINTS
+from muon_decay.sim import simulate_decays
+
+@pytest.fixture(scope='module')
+def decays():
+    return simulate_decays(30000, seed=1)
+
+def page_bytes(decays, bins):
+    edges = np.linspace(0, 20, bins + 1)
+    plot, controls = page_js.fitting_panel(np.histogram(decays, bins=edges)[0], edges, decays)
+    return len(file_html(row(plot, controls), CDN)), plot
+
+def test_page_size_per_bin(decays):
+    small = page_bytes(decays, 4000)[0]
+    large = page_bytes(decays, 40000)[0]
+    #32 bit counts and 64 bit edges, base64 encoded, are 16 bytes a bin
+    assert (large - small)/36000 < 17
+
+def test_curves_decimated(decays):
+    plot = page_bytes(decays, 40000)[1]
+    lines = [renderer.data_source.data for renderer in plot.renderers if 'y' in renderer.data_source.data]
+    assert lines
+    assert all(len(data['y']) <= MAX_POINTS for data in lines)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Range queries of the event store select exactly the decays a mask over all of them selects."""
+import numpy as np
+
+from muon_decay.store import EventStore, daily_ranges, merge_ranges
+
+DAY = 1550188800
+
+def test_select_matches_mask(tmp_path):
+    rng = np.random.default_rng(0)
+    store = EventStore(str(tmp_path / 'store'), block_events=16)
+    runs = []
+    #Overlapping runs, repeated timestamps, one run smaller than a block and one empty
+    for n, first, span in ((1000, 0, 5000), (700, 3000, 3000), (5, 9000, 10), (0, 0, 1), (2000, 12000, 500)):
+        stamps = DAY + first + rng.integers(0, span, n)
+        times = rng.integers(0, 20000, n)
+        store.append(times, stamps)
+        runs.append((times, stamps))
+    times = np.concatenate([run[0] for run in runs])
+    stamps = np.concatenate([run[1] for run in runs])
+    store = EventStore(str(tmp_path / 'store'))
+    assert len(store) == len(stamps)
+    assert store.count() == len(stamps)
+    for i in range(200):
+        starts = DAY + rng.integers(-500, 13000, rng.integers(1, 4))
+        ranges = [(start, start + length) for start, length in zip(starts, rng.integers(0, 3000, len(starts)))]
+        mask = np.zeros(len(stamps), dtype=bool)
+        for start, stop in ranges:
+            mask |= (stamps >= start) & (stamps < stop)
+        selected_times, selected_stamps = store.select(ranges)
+        assert store.count(ranges) == mask.sum()
+        np.testing.assert_array_equal(np.sort(selected_stamps*20000 + selected_times),
+                                      np.sort(stamps[mask]*20000 + times[mask]))
+
+def test_merge_ranges():
+    assert merge_ranges([(5, 8), (0, 3), (3, 4), (7, 10), (12, 12), (20, 15)]) == [(0, 4), (5, 10)]
+    assert merge_ranges([]) == []
+
+def test_daily_ranges_across_midnight():
+    hour = 3600
+    start, stop = DAY + 12*hour, DAY + 84*hour
+    assert daily_ranges(start, stop, 22, 6) == [(DAY + 22*hour, DAY + 30*hour), (DAY + 46*hour, DAY + 54*hour),
+                                                (DAY + 70*hour, DAY + 78*hour)]
+    #22:00 two hours ahead of UTC is 20:00 UTC
+    assert daily_ranges(start, stop, 22, 6, utc_offset_hours=2) == [(DAY + 20*hour, DAY + 28*hour),
+                                                                    (DAY + 44*hour, DAY + 52*hour),
+                                                                    (DAY + 68*hour, DAY + 76*hour)]
+    #Cut short at both ends when start or stop falls inside a night
+    assert daily_ranges(DAY + 2*hour, DAY + 23*hour, 22, 6) == [(DAY + 2*hour, DAY + 6*hour),
+                                                                (DAY + 22*hour, DAY + 23*hour)]
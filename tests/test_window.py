@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""Window histograms from cumulative sums match histograms of each window on its own."""
+import numpy as np
+
+from muon_decay.fit import fit_tau
+from muon_decay.window import rolling_lifetime, window_histograms
+
+def test_window_histograms():
+    rng = np.random.default_rng(0)
+    bin_index = rng.integers(0, 40, 5000)
+    lows = np.sort(rng.integers(0, 5000, 30))
+    highs = np.minimum(lows + rng.integers(0, 2000, 30), 5000)
+    expected = [np.bincount(bin_index[low:high], minlength=40) for low, high in zip(lows, highs)]
+    np.testing.assert_array_equal(window_histograms(bin_index, lows, highs, 40), expected)
+
+def test_rolling_lifetime_matches_fit_tau():
+    rng = np.random.default_rng(1)
+    times = np.round(rng.exponential(2.2, 20000)*1000).astype(np.int64)
+    stamps = np.sort(rng.integers(0, 48*3600, len(times)))
+    edges = np.linspace(0, 20, 401)
+    result = rolling_lifetime(times, stamps, edges, window_hours=6, step_hours=3)
+    for k in (0, len(result['start'])//2):
+        window = (stamps >= result['start'][k]) & (stamps < result['start'][k] + 6*3600)
+        hist = np.histogram(times[window]/1000, bins=edges)[0]
+        assert result['events'][k] == hist.sum()
+        for method, key in (('MLE', 'mle'), ('LS', 'ls')):
+            np.testing.assert_allclose(result[key][k], fit_tau(hist, edges, method)['tau'], rtol=1e-9)